@@ -0,0 +1,163 @@
+import math
+from decimal import localcontext
+
+import numpy as np
+
+import bareiss
+from bareiss import EXACT
+from vector import DECIMAL, FLOAT
+from linsys import LinearSystem
+from lu import LUFactorization
+
+
+# correct significant digits asked of a solution by default
+DIGITS = 10
+# float64 carries about this many significant digits
+FLOAT_DIGITS = 16
+# digits kept beyond what the condition number says is lost
+GUARD_DIGITS = 2
+# above this condition estimate the float LU it came from is itself
+# unreliable, so the estimate can not be trusted to size a Decimal precision
+MAX_TRUSTED_CONDITION = 1e14
+MAX_DECIMAL_PRECISION = 200
+
+
+# Hager's estimate of ||A^-1||_1 with Higham's extra test vector (the method
+# behind LAPACK's xLACON): a few solves with A and A^T, no inverse formed.
+# Usually within a factor of 3 of the true value and never above it.
+def inverse_norm_estimate(lu, max_iter=5):
+    n = lu.dimension
+    x = np.full(n, 1.0 / n)
+    estimate = 0.0
+    for k in range(max_iter):
+        y = lu.solve(x[None])[0]
+        new_estimate = np.abs(y).sum()
+        if k > 0 and new_estimate <= estimate:
+            break
+        estimate = new_estimate
+        z = lu.solve_transpose(np.where(y >= 0, 1.0, -1.0)[None])[0]
+        j = int(np.argmax(np.abs(z)))
+        if k > 0 and np.abs(z[j]) <= z @ x:
+            break
+        x = np.zeros(n)
+        x[j] = 1.0
+
+    signs = (-1.0) ** np.arange(n)
+    alternative = signs * (1 + np.arange(n) / max(n - 1, 1))
+    y = lu.solve(alternative[None])[0]
+    return max(estimate, 2 * np.abs(y).sum() / (3 * n))
+
+
+# estimated 1-norm condition number of a square matrix (inf if the float
+# factorization finds it singular); lu can be passed in when it exists
+def condition_estimate(coefficients, lu=None):
+    a = np.asarray(coefficients, dtype=np.float64)
+    lu = lu or LUFactorization(a, FLOAT)
+    if lu.is_singular():
+        return math.inf
+    return np.abs(a).sum(axis=0).max() * inverse_norm_estimate(lu)
+
+
+# What solve_adaptive found: the solution (a Vector, a tuple of Fractions in
+# exact mode, or a LinearSystem message), the arithmetic it settled on
+# ('float', 'decimal' or 'exact'), the Decimal precision used (None
+# otherwise) and the condition estimate that decided it.
+class AdaptiveResult(object):
+
+    def __init__(self, solution, arithmetic, condition, precision=None):
+        self.solution = solution
+        self.arithmetic = arithmetic
+        self.condition = condition
+        self.precision = precision
+
+    # condition is None (JSON null) when there is no finite estimate
+    def as_dict(self):
+        condition = float(self.condition)
+        return {'arithmetic': self.arithmetic, 'precision': self.precision,
+                'condition': condition if math.isfinite(condition) else None}
+
+    def __str__(self):
+        used = self.arithmetic if self.precision is None else '{} digits'.format(self.precision)
+        return '{} ({}, condition ~{:.2e})'.format(self.solution, used, self.condition)
+
+
+def _message_or_raise(e):
+    if str(e) in (LinearSystem.NO_SOLUTIONS_MSG, LinearSystem.INF_SOLUTIONS_MSG):
+        return str(e)
+    raise e
+
+
+# Solve a LinearSystem (or augmented [A | b] rows) with the cheapest
+# arithmetic that still gives `digits` correct significant digits:
+#
+#   float    when log10(condition) + digits + GUARD_DIGITS fits in float64
+#   decimal  pivoted LU with just that many digits, in a local Decimal
+#            context (the global 30 digits are neither used nor changed)
+#   exact    Bareiss when the matrix is singular or too ill-conditioned for
+#            the float estimate to be believed, and for non-square systems,
+#            whose solution status is a rank question
+#
+# The condition number comes from the float LU factorization plus a few
+# triangular solves, so the float path costs one factorization.
+def solve_adaptive(system, digits=DIGITS):
+    if isinstance(system, LinearSystem):
+        rows = [list(p.normal_vector) + [p.constant_term] for p in system.planes]
+    elif isinstance(system, np.ndarray):
+        # Python numbers, which Decimal and the exact path both take
+        rows = system.tolist()
+    else:
+        rows = system
+    a = np.array([[float(x) for x in row] for row in rows])
+    coefficients, constants = a[:, :-1], a[:, -1]
+
+    condition = math.inf
+    if coefficients.shape[0] == coefficients.shape[1]:
+        lu = LUFactorization(coefficients, FLOAT)
+        condition = condition_estimate(coefficients, lu)
+
+    if condition < MAX_TRUSTED_CONDITION:
+        needed = int(math.ceil(math.log10(max(condition, 1.0)))) + digits + GUARD_DIGITS
+        if needed <= FLOAT_DIGITS:
+            return AdaptiveResult(lu.solve(constants), FLOAT, condition)
+        if needed <= MAX_DECIMAL_PRECISION:
+            with localcontext() as context:
+                context.prec = needed
+                # partial pivoting keeps the rounding error within what the
+                # condition estimate allows for
+                decimal_lu = LUFactorization([row[:-1] for row in rows], DECIMAL)
+                if not decimal_lu.is_singular():
+                    return AdaptiveResult(decimal_lu.solve([row[-1] for row in rows]),
+                                          DECIMAL, condition, needed)
+                # otherwise the absolute near-zero test disagrees with the
+                # estimate; let exact arithmetic decide
+
+    try:
+        solution = bareiss.exact_solution(rows)
+    except Exception as e:
+        solution = _message_or_raise(e)
+    return AdaptiveResult(solution, EXACT, condition)
+
+
+if __name__ == '__main__':
+    # test code
+    from plane import Plane
+    s = LinearSystem([Plane([1, 2, 3], 6), Plane([2, -1, 1], 2), Plane([0, 1, -1], 0)])
+    print(solve_adaptive(s))
+    hilbert = [[1.0 / (i + j + 1) for j in range(8)] + [1] for i in range(8)]
+    print(solve_adaptive(hilbert).as_dict())
+    print(solve_adaptive(hilbert, digits=4).as_dict())
+    print(solve_adaptive([[1, 1, 1], [2, 2, 2]]))
+    if str(solve_adaptive(np.array([[1, 1, 1], [2, 2, 2]])).solution) != LinearSystem.INF_SOLUTIONS_MSG:
+        print('integer array test failed')
+    if solve_adaptive([[1, 1, 1], [2, 2, 2]]).as_dict()['condition'] is not None:
+        print('infinite condition test failed')
+
+    # the Decimal path delivers the digits asked for, even when the first
+    # pivot is tiny (elimination without row exchanges loses 9 digits here)
+    from fractions import Fraction
+    rows = [[1e-9, 1, 1], [1, 1, 2]]
+    result = solve_adaptive(rows, digits=15)
+    exact = bareiss.exact_solution(rows)
+    if result.arithmetic != DECIMAL or any(abs(Fraction(x) - y) > abs(y) * Fraction(1, 10**15)
+                                           for x, y in zip(result.solution, exact)):
+        print('decimal digits test failed')
@@ -0,0 +1,102 @@
+from fractions import Fraction
+from math import gcd
+
+
+# name of this arithmetic among the backends a solver can be asked for
+EXACT = 'exact'
+
+NO_SOLUTIONS_MSG = 'No solutions'
+INF_SOLUTIONS_MSG = 'Infinitely many solutions'
+
+
+# scale every row of an augmented matrix [A | b] by the lcm of its
+# denominators so that all entries are Python ints (the row keeps its meaning)
+def to_integer_rows(rows):
+    integer_rows = []
+    for row in rows:
+        ratios = [_integer_ratio(x) for x in row]
+        scale = 1
+        for _, denominator in ratios:
+            scale = scale * denominator // gcd(scale, denominator)
+        integer_rows.append([numerator * (scale // denominator) for numerator, denominator in ratios])
+    return integer_rows
+
+
+# exact (numerator, denominator) of an int, Decimal, float, Fraction or numeric string
+def _integer_ratio(x):
+    if isinstance(x, int):
+        return x, 1
+    if isinstance(x, str):
+        x = Fraction(x)
+    return x.as_integer_ratio()
+
+
+# Fraction-free (Bareiss) elimination to echelon form, in place on int rows.
+# Each update divides exactly by the previous pivot, so every entry stays a
+# minor of the input and the integers never grow past the determinant size.
+# Returns the list of pivot columns, one per nonzero row.
+def bareiss_eliminate(a):
+    num_equations = len(a)
+    num_variables = len(a[0]) - 1 if a else 0
+    previous_pivot = 1
+    pivots = []
+    row = 0
+    for col in range(num_variables):
+        if row >= num_equations:
+            break
+        pivot_row = next((i for i in range(row, num_equations) if a[i][col] != 0), None)
+        if pivot_row is None:
+            continue
+        if pivot_row != row:
+            a[row], a[pivot_row] = a[pivot_row], a[row]
+
+        pivot = a[row][col]
+        pivot_tail = a[row][col+1:]
+        for i in range(row + 1, num_equations):
+            r = a[i]
+            factor = r[col]
+            if factor == 0:
+                tail = [pivot * y // previous_pivot for y in r[col+1:]]
+            else:
+                tail = [(pivot * y - factor * x) // previous_pivot
+                        for x, y in zip(pivot_tail, r[col+1:])]
+            a[i] = r[:col] + [0] + tail
+
+        previous_pivot = pivot
+        pivots.append(col)
+        row += 1
+    return pivots
+
+
+# exact rank of the coefficient part of an augmented matrix
+def exact_rank(rows):
+    a = to_integer_rows(rows)
+    return len(bareiss_eliminate(a))
+
+
+# exact solution of [A | b] as a tuple of Fractions; raises with the
+# LinearSystem messages when there is no or no unique solution
+def exact_solution(rows):
+    a = to_integer_rows(rows)
+    num_variables = len(a[0]) - 1
+    pivots = bareiss_eliminate(a)
+
+    for r in a[len(pivots):]:
+        if r[-1] != 0:
+            raise Exception(NO_SOLUTIONS_MSG)
+    if len(pivots) < num_variables:
+        raise Exception(INF_SOLUTIONS_MSG)
+
+    x = [Fraction(0)] * num_variables
+    for row in range(num_variables - 1, -1, -1):
+        r = a[row]
+        total = r[-1] - sum(r[j] * x[j] for j in range(row + 1, num_variables))
+        x[row] = Fraction(total, r[row])
+    return tuple(x)
+
+
+if __name__ == '__main__':
+    # test code
+    print(exact_solution([[1, 2, 3, 6], [2, -1, 1, 2], [0, 1, -1, 0]]))
+    print(exact_solution([['0.1', '0.2', '0.3'], [3, -1, Fraction(1, 3)]]))
+    print(exact_rank([[1, 1, 1, 1], [2, 2, 2, 2]]))
@@ -0,0 +1,288 @@
+# Benchmarks for the Vector, Line, Plane and LinearSystem hot paths.
+#
+#     python bench.py -o results.jsonl            # full sweep
+#     python bench.py --quick --filter vector     # small sweep, matching names
+#     python bench.py --compare old.jsonl new.jsonl
+#
+# Every measurement is one JSON line: the benchmark name, its parameters
+# (backend, dimension, batch size), the number of calls per timing run and
+# the best / median seconds per call over the repeats, plus the Python and
+# numpy versions, so runs from different commits can be compared.
+import argparse
+import itertools
+import json
+import platform
+import random
+import sys
+import timeit
+
+import numpy as np
+
+from vector import Vector, DECIMAL, FLOAT
+from vectorbatch import VectorBatch
+from line import Line
+from plane import Plane
+from linsys import LinearSystem, AugmentedMatrix
+from lu import LUFactorization
+import blocked
+
+BACKENDS = (DECIMAL, FLOAT)
+DIMENSIONS = (3, 10, 100)
+BATCH_SIZES = (100, 10000)
+SYSTEM_SIZES = (3, 10, 50)
+
+QUICK = {'dimension': (3, 10), 'batch': (100,), 'size': (3, 10)}
+
+# name -> (parameter grid, setup(params) returning the callable to time)
+BENCHMARKS = {}
+
+
+def benchmark(name, **grid):
+    def register(setup):
+        BENCHMARKS[name] = (grid, setup)
+        return setup
+    return register
+
+
+def _coordinates(dimension, seed=0):
+    rng = random.Random(seed)
+    return [round(rng.uniform(-10, 10), 3) for _ in range(dimension)]
+
+
+def _vectors(backend, dimension):
+    return Vector(_coordinates(dimension, 1), backend), Vector(_coordinates(dimension, 2), backend)
+
+
+def _rows(size, seed=0):
+    rng = random.Random(seed)
+    return [[round(rng.uniform(-10, 10), 3) for _ in range(size + 1)] for _ in range(size)]
+
+
+def _planes(count=3, seed=0):
+    return [Plane(row[:3], row[3]) for row in _rows(3, seed)[:count]]
+
+
+@benchmark('vector.plus', backend=BACKENDS, dimension=DIMENSIONS)
+def _(backend, dimension):
+    v, w = _vectors(backend, dimension)
+    return lambda: v.plus(w)
+
+
+@benchmark('vector.minus', backend=BACKENDS, dimension=DIMENSIONS)
+def _(backend, dimension):
+    v, w = _vectors(backend, dimension)
+    return lambda: v.minus(w)
+
+
+@benchmark('vector.scalar', backend=BACKENDS, dimension=DIMENSIONS)
+def _(backend, dimension):
+    v, _ = _vectors(backend, dimension)
+    return lambda: v.scalar(3)
+
+
+@benchmark('vector.inner_product', backend=BACKENDS, dimension=DIMENSIONS)
+def _(backend, dimension):
+    v, w = _vectors(backend, dimension)
+    return lambda: v.inner_product(w)
+
+
+# magnitude is cached per vector, so time it on fresh vectors
+@benchmark('vector.magnitude', backend=BACKENDS, dimension=DIMENSIONS)
+def _(backend, dimension):
+    coordinates = _coordinates(dimension)
+    return lambda: Vector(coordinates, backend).magnitude()
+
+
+@benchmark('vector.cross_product', backend=BACKENDS)
+def _(backend):
+    v, w = _vectors(backend, 3)
+    return lambda: v.cross_product(w)
+
+
+@benchmark('vector.angel', backend=BACKENDS, dimension=DIMENSIONS)
+def _(backend, dimension):
+    a, b = _coordinates(dimension, 1), _coordinates(dimension, 2)
+    return lambda: Vector(a, backend).angel(Vector(b, backend))
+
+
+@benchmark('vector.is_parallel_to', backend=BACKENDS, dimension=DIMENSIONS)
+def _(backend, dimension):
+    a, b = _coordinates(dimension, 1), _coordinates(dimension, 2)
+    return lambda: Vector(a, backend).is_parallel_to(Vector(b, backend))
+
+
+# a chained expression step by step vs fused by Vector.lazy(), on a fresh
+# base vector so no magnitude or unit vector is cached
+@benchmark('vector.perp_chain', backend=BACKENDS, dimension=DIMENSIONS)
+def _(backend, dimension):
+    v, base = Vector(_coordinates(dimension, 1), backend), _coordinates(dimension, 2)
+    return lambda: v.minus(v.vector_projections(Vector(base, backend))).scalar(3)
+
+
+@benchmark('vector.perp_chain.lazy', backend=BACKENDS, dimension=DIMENSIONS)
+def _(backend, dimension):
+    v, base = Vector(_coordinates(dimension, 1), backend), _coordinates(dimension, 2)
+    return lambda: v.lazy().vector_perp(Vector(base, backend)).scalar(3).evaluate()
+
+
+# the same work over a whole batch: a loop of Vectors vs one VectorBatch call
+@benchmark('vector.plus.loop', backend=BACKENDS, batch=BATCH_SIZES)
+def _(backend, batch):
+    vs = [Vector(_coordinates(3, i), backend) for i in range(batch)]
+    w = Vector(_coordinates(3), backend)
+    return lambda: [v.plus(w) for v in vs]
+
+
+@benchmark('vectorbatch.plus', batch=BATCH_SIZES)
+def _(batch):
+    vs = VectorBatch([_coordinates(3, i) for i in range(batch)])
+    w = Vector(_coordinates(3), FLOAT)
+    return lambda: vs.plus(w)
+
+
+@benchmark('vectorbatch.cross_product', batch=BATCH_SIZES)
+def _(batch):
+    vs = VectorBatch([_coordinates(3, i) for i in range(batch)])
+    ws = VectorBatch([_coordinates(3, i + batch) for i in range(batch)])
+    return lambda: vs.cross_product(ws)
+
+
+@benchmark('line.intersect_with_at')
+def _():
+    l1, l2 = Line([7.204, 3.182], 8.68), Line([8.172, 4.114], 9.883)
+    return lambda: l1.intersect_with_at(l2)
+
+
+@benchmark('plane.__eq__')
+def _():
+    p1, p2 = Plane([-7.926, 8.625, -7.212], -7.952), Plane([-2.642, 2.875, -2.404], -2.443)
+    return lambda: p1 == p2
+
+
+@benchmark('linsys.swap_rows')
+def _():
+    s = LinearSystem(_planes())
+    return lambda: s.swap_rows(0, 2)
+
+
+@benchmark('linsys.multiply_coefficient_and_row')
+def _():
+    s = LinearSystem(_planes())
+    return lambda: s.multiply_coefficient_and_row(1, 1)
+
+
+@benchmark('linsys.add_multiple_times_row_to_row')
+def _():
+    s = LinearSystem(_planes())
+    return lambda: s.add_multiple_times_row_to_row(0, 0, 1)
+
+
+@benchmark('linsys.compute_triangular_form', backend=BACKENDS)
+def _(backend):
+    s = LinearSystem(_planes(), backend)
+    return s.compute_triangular_form
+
+
+@benchmark('linsys.compute_solution', backend=BACKENDS)
+def _(backend):
+    s = LinearSystem(_planes(), backend)
+    return s.compute_solution
+
+
+@benchmark('linsys.compute_exact_solution')
+def _():
+    s = LinearSystem(_planes())
+    return s.compute_exact_solution
+
+
+# elimination on the augmented matrix alone, swept over the system size
+@benchmark('augmented_matrix.solve', backend=BACKENDS, size=SYSTEM_SIZES)
+def _(backend, size):
+    rows = _rows(size)
+    return lambda: AugmentedMatrix(rows, backend).solve()
+
+
+@benchmark('linsys.factorize.solve', backend=BACKENDS, size=SYSTEM_SIZES)
+def _(backend, size):
+    rows = _rows(size)
+    lu = LUFactorization([row[:-1] for row in rows], backend)
+    b = [row[-1] for row in rows]
+    return lambda: lu.solve(b)
+
+
+# blocked LU of a large float matrix at different thread counts
+@benchmark('lu.blocked', size=(256, 1024), threads=(1, 2, 4))
+def _(size, threads):
+    a = np.random.default_rng(0).normal(size=(size, size))
+    return lambda: LUFactorization(a, FLOAT, block=blocked.BLOCK, threads=threads)
+
+
+# time one callable: calls per run picked by autorange (>= 0.2 s), best and
+# median seconds per call over the repeats
+def measure(fn, repeat=5):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    times = sorted(t / number for t in timer.repeat(repeat=repeat, number=number))
+    return number, times[0], times[len(times) // 2]
+
+
+def run(names=None, quick=False, repeat=5, out=sys.stdout):
+    environment = {'python': platform.python_version(), 'numpy': np.__version__}
+    for name, (grid, setup) in sorted(BENCHMARKS.items()):
+        if names and not any(n in name for n in names):
+            continue
+        keys = sorted(grid)
+        values = [QUICK.get(k, grid[k]) if quick else grid[k] for k in keys]
+        for combination in itertools.product(*values):
+            params = dict(zip(keys, combination))
+            number, best, median = measure(setup(**params), repeat)
+            record = {'name': name, 'params': params, 'number': number,
+                      'best': best, 'median': median}
+            record.update(environment)
+            out.write(json.dumps(record) + '\n')
+            out.flush()
+
+
+def _key(record):
+    return record['name'], json.dumps(record['params'], sort_keys=True)
+
+
+def _load(path):
+    with open(path) as f:
+        return {_key(r): r for r in (json.loads(line) for line in f if line.strip())}
+
+
+# print new/old best time for every benchmark found in both files
+def compare(old_path, new_path, out=sys.stdout):
+    old, new = _load(old_path), _load(new_path)
+    for key in sorted(set(old) & set(new)):
+        ratio = new[key]['best'] / old[key]['best']
+        out.write('{:<40} {:<45} {:>12.3e} {:>12.3e} {:>7.2f}x\n'.format(
+            key[0], key[1], old[key]['best'], new[key]['best'], ratio))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the linear algebra hot paths.')
+    parser.add_argument('-o', '--output', default='-', help='result file, - for stdout (default)')
+    parser.add_argument('--filter', action='append', help='only run benchmarks whose name contains this')
+    parser.add_argument('--quick', action='store_true', help='smaller parameter sweep')
+    parser.add_argument('--repeat', type=int, default=5, help='timing runs per measurement')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two result files instead of running')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        run(args.filter, args.quick, args.repeat, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
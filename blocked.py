@@ -0,0 +1,79 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# columns factored per panel; the trailing update is a matrix product of
+# this inner size, big enough to run at BLAS speed
+BLOCK = 64
+# rows of the trailing matrix handed to one thread at a time
+ROW_BLOCK = 256
+NEAR_ZERO_EPS = 1e-10
+
+
+# Blocked right-looking LU with partial pivoting of a square float64 array,
+# in place, stored the same way as LUFactorization (unit L below the
+# diagonal, U on and above it). Returns (perm, sign).
+#
+# Each step factors a panel of `block` columns the ordinary way, solves for
+# the matching block row of U, then updates the trailing matrix with one
+# matrix product per row block. The products release the GIL, so the row
+# blocks run on `threads` threads at once (default: one per core).
+def lu_factor(a, block=BLOCK, threads=None):
+    n = a.shape[0]
+    perm = np.arange(n)
+    sign = 1
+    threads = threads or os.cpu_count() or 1
+
+    with ThreadPoolExecutor(threads) as pool:
+        for k in range(0, n, block):
+            end = min(k + block, n)
+            sign *= _factor_panel(a, perm, k, end)
+            if end == n:
+                break
+
+            # U12 = L11^-1 A12 (L11 is unit lower triangular)
+            for i in range(k + 1, end):
+                a[i, end:] -= a[i, k:i] @ a[k:i, end:]
+
+            # A22 -= L21 U12, one row block per task
+            l21, u12 = a[end:, k:end], a[k:end, end:]
+            starts = range(end, n, ROW_BLOCK)
+            if threads == 1 or len(starts) == 1:
+                a[end:, end:] -= l21 @ u12
+            else:
+                list(pool.map(lambda start: _update_rows(a, l21, u12, start, end), starts))
+    return perm, sign
+
+
+def _update_rows(a, l21, u12, start, end):
+    stop = min(start + ROW_BLOCK, a.shape[0])
+    a[start:stop, end:] -= l21[start - end:stop - end] @ u12
+
+
+# unblocked elimination of columns k:end, touching only the panel below
+# row k; row swaps are applied to whole rows. Returns the sign of the swaps.
+def _factor_panel(a, perm, k, end):
+    sign = 1
+    for j in range(k, end):
+        p = j + int(np.argmax(np.abs(a[j:, j])))
+        if abs(a[p, j]) < NEAR_ZERO_EPS:
+            # nothing to eliminate in this column, U gets a zero pivot
+            a[j:, j] = 0
+            continue
+        if p != j:
+            a[[j, p]] = a[[p, j]]
+            perm[[j, p]] = perm[[p, j]]
+            sign = -sign
+        a[j+1:, j] /= a[j, j]
+        a[j+1:, j+1:end] -= np.outer(a[j+1:, j], a[j, j+1:end])
+    return sign
+
+
+if __name__ == '__main__':
+    # test code
+    a = np.array([[1.0, 2, 3], [2, -1, 1], [0, 1, -1]])
+    lu = a.copy()
+    perm, sign = lu_factor(lu, block=2)
+    l, u = np.tril(lu, -1) + np.eye(3), np.triu(lu)
+    print(np.allclose(l @ u, a[perm]), sign)
@@ -0,0 +1,316 @@
+import hashlib
+import io
+import json
+import sqlite3
+from collections import OrderedDict
+from decimal import Decimal
+from fractions import Fraction
+
+import numpy as np
+
+from vector import Vector, FLOAT
+from linsys import LinearSystem, AugmentedMatrix
+from lu import LUFactorization
+
+
+def _rows(system):
+    if isinstance(system, LinearSystem):
+        return AugmentedMatrix.from_planes(system.planes, FLOAT).data
+    return np.array(system, dtype=np.float64)
+
+
+def _exact_rows(system):
+    if isinstance(system, LinearSystem):
+        return [[Fraction(x) for x in p.normal_vector] + [Fraction(p.constant_term)]
+                for p in system.planes]
+    return [[Fraction(x) for x in row] for row in system]
+
+
+# Fingerprint of a system that does not change when its equations are
+# reordered or multiplied by nonzero numbers: every row is divided by its
+# first nonzero coefficient, in exact rational arithmetic, and the rows are
+# sorted, so only systems with the same canonical form share a digest.
+# Returns (digest, order, scale): canonical row i is original row order[i]
+# times scale[order[i]] (a unit normal with the first nonzero coefficient
+# positive, in floats). With constants=False only the coefficients count,
+# for entries that do not depend on b.
+def fingerprint(system, constants=True):
+    return _canonical(system, constants)[:3]
+
+
+# fingerprint plus the exact canonical rows (keys) and the first nonzero
+# coefficient each row was divided by (1 for zero rows)
+def _canonical(system, constants):
+    rows = _rows(system)
+    norms = np.sqrt(np.einsum('ij,ij->i', rows[:, :-1], rows[:, :-1]))
+    scale = np.ones(len(rows))
+    keys = []
+    firsts = []
+    for i, row in enumerate(_exact_rows(system)):
+        first = next((x for x in row[:-1] if x != 0), None)
+        firsts.append(first or Fraction(1))
+        if first is None:
+            # "0 = k" rows only matter through whether k is zero
+            key = row[:-1] + [Fraction(row[-1] != 0)]
+        else:
+            key = [x / first for x in row]
+            if norms[i] > 0:
+                scale[i] = (1 if first > 0 else -1) / norms[i]
+        keys.append(tuple(key if constants else key[:-1]))
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    text = '{}|{}'.format(rows.shape[1], ';'.join(' '.join(map(str, keys[i])) for i in order))
+    return hashlib.sha1(text.encode()).hexdigest(), np.array(order, dtype=np.int64), scale, keys, firsts
+
+
+def _decimal(x):
+    return Decimal(x.numerator) / Decimal(x.denominator)
+
+
+# An LU factorization cached for a canonical system, used for any system
+# with the same fingerprint: b is brought into the canonical row order and
+# scale (floats, or Decimals for a Decimal LU) before the triangular solves.
+class CachedFactorization(object):
+
+    def __init__(self, lu, order, scale):
+        self.lu = lu
+        self.order = order
+        self.scale = scale
+
+    def solve(self, b):
+        if self.lu.backend == FLOAT:
+            b = np.array([float(x) for x in b]) * self.scale
+        else:
+            b = np.array([Decimal(x) * s for x, s in zip(b, self.scale)], dtype=object)
+        return self.lu.solve(list(b[self.order]))
+
+    def rank(self):
+        return self.lu.rank()
+
+    def is_singular(self):
+        return self.lu.is_singular()
+
+
+def _array(values, backend):
+    if backend == FLOAT:
+        return np.asarray(values, dtype=np.float64)
+    return np.asarray(values, dtype=object).astype(str)
+
+
+def _values(array, backend):
+    if backend == FLOAT:
+        return array
+    return np.array([Decimal(x) for x in array.ravel().tolist()], dtype=object).reshape(array.shape)
+
+
+# An entry as bytes that are read back without unpickling anything:
+# solutions and ranks as JSON text (Decimals as their exact strings), LU
+# factorizations as .npz arrays of numbers and strings.
+def _encode(value):
+    if isinstance(value, str):
+        return json.dumps({'message': value}).encode()
+    if isinstance(value, int):
+        return json.dumps({'rank': value}).encode()
+    if isinstance(value, Vector):
+        return json.dumps({'backend': value.backend,
+                           'coordinates': _array(value.coordinates, value.backend).tolist()}).encode()
+    out = io.BytesIO()
+    np.savez(out, backend=value.backend, lu=_array(value.lu, value.backend),
+             perm=value.perm, sign=value.sign)
+    return out.getvalue()
+
+
+def _decode(blob):
+    if not blob.startswith(b'{'):
+        entry = np.load(io.BytesIO(blob), allow_pickle=False)
+        backend = str(entry['backend'])
+        return LUFactorization._from_factors(_values(entry['lu'], backend), entry['perm'],
+                                             int(entry['sign']), backend)
+    entry = json.loads(blob)
+    if 'message' in entry:
+        return entry['message']
+    if 'rank' in entry:
+        return entry['rank']
+    return Vector(entry['coordinates'], entry['backend'])
+
+
+# Memoizes compute_solution, exact_rank and factorize of LinearSystems by
+# fingerprint, so a system seen before (possibly with its equations
+# reordered or rescaled) is answered without elimination.
+#
+# Entries are kept in least recently used order and evicted beyond maxsize
+# entries or max_bytes (their encoded size). With path, entries also go to
+# an sqlite file that later runs, or other processes, read on a miss; they
+# are stored as plain arrays (see _encode), so reading a file someone else
+# wrote can give wrong answers but never runs code.
+class SolutionCache(object):
+
+    def __init__(self, maxsize=1024, max_bytes=None, path=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, encoded size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path)
+            self._db.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB)')
+            self._db.commit()
+
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    def _get(self, key):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+        if self._db is not None:
+            row = self._db.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                value = _decode(row[0])
+                self._remember(key, value, len(row[0]))
+                return value
+        self.misses += 1
+        return None
+
+
+    def _remember(self, key, value, size):
+        self._entries[key] = (value, size)
+        self.bytes += size
+        while self._entries and (len(self._entries) > self.maxsize
+                                 or (self.max_bytes is not None and self.bytes > self.max_bytes)):
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+
+    def _put(self, key, value):
+        blob = _encode(value)
+        self._remember(key, value, len(blob))
+        if self._db is not None:
+            self._db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?)', (key, blob))
+            self._db.commit()
+
+
+    # same result as system.compute_solution()
+    def compute_solution(self, system):
+        key = 'solution:{}:{}'.format(system.backend, fingerprint(system, True)[0])
+        result = self._get(key)
+        if result is None:
+            result = system.compute_solution()
+            self._put(key, result)
+        return result
+
+
+    # same result as system.exact_rank(), the rank of the coefficients
+    def exact_rank(self, system):
+        key = 'rank:{}'.format(fingerprint(system, False)[0])
+        result = self._get(key)
+        if result is None:
+            result = system.exact_rank()
+            self._put(key, result)
+        return result
+
+
+    # LU factorization of the coefficients in canonical form, wrapped so
+    # that solve(b) takes the constants of this particular system. Float
+    # systems factorize their unit-normal rows; Decimal systems the exact
+    # canonical rows, so no coefficient goes through a float.
+    def factorize(self, system):
+        digest, order, scale, keys, firsts = _canonical(system, False)
+        if system.backend != FLOAT:
+            scale = [1 / _decimal(first) for first in firsts]
+        key = 'lu:{}:{}'.format(system.backend, digest)
+        lu = self._get(key)
+        if lu is None:
+            if system.backend == FLOAT:
+                coefficients = (_rows(system)[:, :-1] * scale[:, None])[order]
+            else:
+                coefficients = [[_decimal(x) for x in keys[i]] for i in order]
+            lu = LUFactorization(coefficients, system.backend)
+            self._put(key, lu)
+        return CachedFactorization(lu, order, scale)
+
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'entries': len(self._entries), 'bytes': self.bytes, 'hits': self.hits,
+                'misses': self.misses, 'disk_hits': self.disk_hits, 'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
+
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+        if self._db is not None:
+            self._db.execute('DELETE FROM entries')
+            self._db.commit()
+
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+if __name__ == '__main__':
+    # test code
+    from plane import Plane
+    cache = SolutionCache(maxsize=8)
+    s1 = LinearSystem([Plane([1, 2, 3], 6), Plane([2, -1, 1], 2), Plane([0, 1, -1], 0)])
+    s2 = LinearSystem([Plane([0, -2, 2], 0), Plane([1, 2, 3], 6), Plane([4, -2, 2], 4)])
+    print(cache.compute_solution(s1), cache.compute_solution(s2))
+    print(cache.factorize(s2).solve([0, 6, 4]), cache.exact_rank(s1))
+    print(cache.stats())
+
+    # systems that only nearly agree never share an entry, while reordered
+    # and rescaled copies still do
+    from line import Line
+    cache = SolutionCache()
+    tiny = [LinearSystem([Line([1, 0], k), Line([0, 1], 0)]) for k in ('1e-10', '3e-10')]
+    if str(cache.compute_solution(tiny[0])) == str(cache.compute_solution(tiny[1])):
+        print('near-equal constants test failed')
+    unique = LinearSystem([Line([1, 1], 1), Line([1, '1.0000000003'], '1.0000000003')])
+    singular = LinearSystem([Line([1, 1], 1), Line([1, 1], 1)])
+    if (cache.compute_solution(singular) == cache.compute_solution(unique)
+            or cache.exact_rank(singular) == cache.exact_rank(unique)
+            or not cache.factorize(singular).is_singular()
+            or cache.factorize(unique).is_singular()):
+        print('near-singular test failed')
+    hits = cache.hits
+    rescaled = LinearSystem([Line([0, -2], 0), Line([3, 0], '9e-10')])
+    if str(cache.compute_solution(rescaled)) != str(cache.compute_solution(tiny[1])) or cache.hits != hits + 2:
+        print('rescaled system test failed')
+
+    # entries read back from the sqlite file equal the ones stored
+    import os
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(), 'cache.sqlite')
+    s3 = LinearSystem([Plane([1, 1, 1], 1), Plane([1, 1, 1], 2), Plane([0, 1, 0], 0)])
+    s4 = LinearSystem([Plane([1, 2, 3], 6), Plane([2, -1, 1], 2), Plane([0, 1, -1], 0)], FLOAT)
+    writer = SolutionCache(path=path)
+    stored = [writer.compute_solution(s) for s in (s1, s3, s4)] + [writer.exact_rank(s3)] + \
+        [writer.factorize(s).solve([6, 2, 0]) for s in (s1, s4)]
+    reader = SolutionCache(path=path)
+    read = [reader.compute_solution(s) for s in (s1, s3, s4)] + [reader.exact_rank(s3)] + \
+        [reader.factorize(s).solve([6, 2, 0]) for s in (s1, s4)]
+    if read != stored or reader.disk_hits != 6:
+        print('sqlite round trip test failed')
+    writer.close()
+    reader.close()
+
+    # a Decimal system is factorized from its exact coefficients, not from
+    # floats: the cached LU solves it like the system's own LU
+    s5 = LinearSystem([Plane(['0.1', '1e-20', 1], '0.3'), Plane([3, '0.7', '-2.1'], 1),
+                       Plane(['1.000000000000000000001', 2, 0], 5)])
+    b = ['0.3', 1, 5]
+    cached, direct = SolutionCache().factorize(s5).solve(b), s5.factorize().solve(b)
+    if cached.minus(direct).magnitude() > Decimal('1e-25') * direct.magnitude():
+        print('decimal factorization test failed')
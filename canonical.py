@@ -0,0 +1,170 @@
+import numpy as np
+
+from vector import FLOAT
+from linsys import AugmentedMatrix
+
+
+# [A | k] rows for a list of Hyperplanes (Lines, Planes), or the array itself
+def _augmented(planes):
+    if isinstance(planes, np.ndarray):
+        return np.asarray(planes, dtype=np.float64)
+    return AugmentedMatrix.from_planes(planes, FLOAT).data
+
+
+# The factor that brings every [A | k] row to canonical form: the normal
+# scaled to unit length with its first nonzero coefficient positive. Rows
+# with a zero normal get 1 and are flagged in `zero`.
+def canonical_scale(rows, tolerance=1e-10):
+    normals = rows[:, :-1]
+    norms = np.sqrt(np.einsum('ij,ij->i', normals, normals))
+    zero = norms < tolerance
+
+    scale = np.ones(len(rows))
+    scale[~zero] = 1 / norms[~zero]
+    nonzero = np.abs(normals * scale[:, None]) >= tolerance
+    first = nonzero.argmax(axis=1)
+    sign = np.sign(normals[np.arange(len(rows)), first])
+    sign[zero | (sign == 0)] = 1
+    return scale * sign, zero
+
+
+# canonical form of every row (the constant scaled with the normal) and the
+# zero-normal flags
+def canonical_rows(planes, tolerance=1e-10):
+    rows = _augmented(planes)
+    scale, zero = canonical_scale(rows, tolerance)
+    return rows * scale[:, None], zero
+
+
+# largest cell index _group_rows computes in int64
+INDEX_LIMIT = 2.0 ** 62
+
+
+def _void_keys(keys):
+    keys = np.ascontiguousarray(keys, dtype=np.int64)
+    return keys.view(np.dtype((np.void, keys.dtype.itemsize * keys.shape[1]))).ravel()
+
+
+# Group rows whose values agree within about `tolerance` in every column.
+# Rows are hashed to a grid of `tolerance` wide cells centred on multiples
+# of tolerance (one np.unique), so rows sharing a cell are closer than
+# tolerance. Rows closer than tolerance sit in cells whose indices differ by
+# at most 1 in every column; such cells are linked (see _neighbour_cells)
+# and merged. Merging is transitive, so a long chain of near rows can join
+# one group. Returns a group label per row.
+#
+# Past INDEX_LIMIT cells the index does not fit an int64, but there floats
+# are already thousands of tolerances apart, so such values only group with
+# equal ones: they get cell 0 plus an extra column numbering their distinct
+# values with even codes, which are never neighbours.
+def _group_rows(values, tolerance):
+    scaled = values / tolerance + 0.5
+    outside = ~(np.abs(scaled) < INDEX_LIMIT)
+    keys = np.floor(np.where(outside, 0, scaled)).astype(np.int64)
+    exact = []
+    for j in np.flatnonzero(outside.any(axis=0)):
+        codes = np.zeros(len(values), dtype=np.int64)
+        _, index = np.unique(values[outside[:, j], j], return_inverse=True)
+        codes[outside[:, j]] = 2 * index.ravel() + 2
+        exact.append(codes)
+    if exact:
+        keys = np.column_stack([keys] + exact)
+    unique_keys, labels = np.unique(_void_keys(keys), return_inverse=True)
+    labels = labels.ravel()
+    cells = unique_keys.view(np.int64).reshape(len(unique_keys), keys.shape[1])
+    first, second = _neighbour_cells(cells)
+
+    # connected components of the linked cells (label propagation)
+    component = np.arange(len(unique_keys))
+    if len(first):
+        while True:
+            low = np.minimum(component[first], component[second])
+            before = component.copy()
+            np.minimum.at(component, first, low)
+            np.minimum.at(component, second, low)
+            component = component[component]
+            if np.array_equal(before, component):
+                break
+    return component[labels]
+
+
+# Pairs of distinct cells whose indices differ by at most 1 in every column,
+# without probing the 3^d neighbours of each cell: along a fixed random
+# direction such cells lie within `reach` of each other, so after sorting
+# the cells by position only the ones inside that window are compared.
+# Far apart cells rarely land in one window, so the work stays close to a
+# sort plus the number of neighbouring pairs, whatever the dimension.
+def _neighbour_cells(cells):
+    empty = np.zeros(0, dtype=np.int64)
+    if len(cells) < 2:
+        return empty, empty
+    direction = np.random.default_rng(0).uniform(-1, 1, cells.shape[1])
+    position = cells @ direction
+    # the slack covers rounding in the positions of large indices
+    reach = np.abs(direction).sum() * (1 + 1e-9) \
+        + 1e-15 * cells.shape[1] * float(np.abs(cells).max())
+    order = np.argsort(position, kind='stable')
+    position, cells = position[order], cells[order]
+
+    first, second = [], []
+    for offset in range(1, len(cells)):
+        close = np.flatnonzero(position[offset:] - position[:-offset] <= reach)
+        if not len(close):
+            break  # the sorted gaps only grow with the offset
+        near = (np.abs(cells[close + offset] - cells[close]) <= 1).all(axis=1)
+        first.append(order[close[near]])
+        second.append(order[close[near] + offset])
+    if not first:
+        return empty, empty
+    return np.concatenate(first), np.concatenate(second)
+
+
+def _groups_from_labels(labels):
+    order = np.argsort(labels, kind='stable')
+    sorted_labels = labels[order]
+    starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+    groups = [order[start:end].tolist() for start, end in zip(starts, np.r_[starts[1:], len(order)])]
+    groups.sort(key=lambda g: g[0])
+    return groups
+
+
+# indices of the planes grouped into parallel families (lists in input
+# order); planes with a zero normal form a family of their own
+def group_parallel(planes, tolerance=1e-9):
+    rows, zero = canonical_rows(planes, tolerance)
+    labels = _group_rows(rows[:, :-1], tolerance)
+    labels = np.where(zero, -1, labels)
+    return _groups_from_labels(labels)
+
+
+# indices of the planes grouped into sets describing the same plane
+def group_identical(planes, tolerance=1e-9):
+    rows, zero = canonical_rows(planes, tolerance)
+    labels = _group_rows(rows, tolerance)
+    # zero-normal rows are "0 = k": equal exactly when their constants are
+    zero_labels = _group_rows(rows[:, -1:], tolerance)
+    labels = np.where(zero, -1 - zero_labels, labels)
+    return _groups_from_labels(labels)
+
+
+# one representative (the first) of every set of identical planes
+def unique_planes(planes, tolerance=1e-9):
+    return [planes[g[0]] for g in group_identical(planes, tolerance)]
+
+
+if __name__ == '__main__':
+    # test code
+    from plane import Plane
+    planes = [Plane([-0.412, 3.806, 0.728], -3.46), Plane([1.03, -9.515, -1.82], 8.65),
+              Plane([-7.926, 8.625, -7.212], -7.952), Plane([-2.642, 2.875, -2.404], -2.443),
+              Plane([2, 0, 0], 4), Plane([-1, 0, 0], -2), Plane([0, 0, 0], 0)]
+    print(group_parallel(planes))
+    print(group_identical(planes))
+
+    # constants too large for a tolerance-wide cell index are compared exactly
+    large = [Plane([1, 0, 0], 2e10), Plane([1, 0, 0], -2e10), Plane([1, 0, 0], 1e10),
+             Plane([1, 0, 0], 1e10 + 1), Plane([2, 0, 0], 2e10), Plane([0, 0, 0], 3e10),
+             Plane([0, 0, 0], 6e10)]
+    if group_identical(large) != [[0], [1], [2, 4], [3], [5], [6]] or \
+            group_identical(large + [Plane([1, 0, 0], 2e10)]) != [[0, 7], [1], [2, 4], [3], [5], [6]]:
+        print('large constant test failed')
@@ -0,0 +1,312 @@
+# A long-running solver service, so short-lived clients do not each pay for
+# importing numpy and this package.
+#
+#     python daemon.py --socket /tmp/linalg.sock     # serve a Unix socket
+#     python daemon.py                               # serve stdin / stdout
+#
+# Requests and responses are JSON lines. Every request carries an "op" and
+# an optional "id" that is copied into its response; responses on one
+# connection can come back in a different order than the requests.
+#
+#     {"id": 1, "op": "solve", "coefficients": [[...], ...], "constants": [...]}
+#         -> {"id": 1, "status": "unique" | "none" | "infinite", "solution": [...]}
+#     {"id": 2, "op": "intersection", "lines": [[A, B, k], [C, D, k2]]}
+#         -> {"id": 2, "result": [x, y] | "no intersection" | "infinitely many intersections"}
+#     {"id": 3, "op": "parallel", "vectors": [[...], [...]]}  -> {"id": 3, "result": true}
+#     {"id": 4, "op": "projection", "vector": [...], "base": [...]}  -> {"id": 4, "result": [...]}
+#     {"id": 5, "op": "stats"}  -> request counts and latency percentiles
+#
+# Solves from all connections go through one bounded queue. A batcher takes
+# whatever is waiting (up to --batch systems, waiting at most --wait seconds
+# for more) and solves it as one batch off the event loop, so concurrent
+# small systems share stacked numpy solves. A connection with IN_FLIGHT
+# unanswered requests stops reading, and so does every connection while
+# --queue requests are unanswered in all, until there is room; that pushes
+# back on the clients and bounds what the daemon holds.
+# Geometry queries are cheap and answered inline.
+import argparse
+import asyncio
+import json
+import os
+import stat
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from vector import Vector, DECIMAL, FLOAT
+from line import Line
+from bareiss import EXACT
+from parallel import solve_batch
+from linsolve import STATUS_BY_MSG, json_number
+
+BATCH_SIZE = 256
+BATCH_WAIT = 0.002
+QUEUE_SIZE = 4096
+# unanswered requests one connection may have before its reader pauses
+IN_FLIGHT = 256
+# latencies kept for the percentiles
+LATENCY_WINDOW = 10000
+
+class SolverDaemon(object):
+
+    UNKNOWN_OP_MSG = 'unknown op {!r}'
+    NOT_A_SOCKET_MSG = '{} exists and is not a socket'
+
+    def __init__(self, backend=FLOAT, batch_size=BATCH_SIZE, batch_wait=BATCH_WAIT,
+                 queue_size=QUEUE_SIZE):
+        self.backend = backend
+        # geometry runs on Vectors, which have no exact backend
+        self.vector_backend = DECIMAL if backend == EXACT else backend
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.queue_size = queue_size
+        self.queue = None
+        # room for one more unanswered request, across all connections
+        self.room = None
+        self.requests = 0
+        self.batches = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def stats(self):
+        record = {'requests': self.requests, 'batches': self.batches,
+                  'queued': self.queue.qsize() if self.queue else 0}
+        if self.latencies:
+            p50, p90, p99 = np.percentile(self.latencies, [50, 90, 99])
+            record.update({'p50_ms': p50 * 1e3, 'p90_ms': p90 * 1e3, 'p99_ms': p99 * 1e3,
+                           'max_ms': max(self.latencies) * 1e3})
+        return record
+
+    # take what is queued (waiting briefly for stragglers) and solve it as
+    # one batch in a worker thread
+    async def batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+
+            self.batches += 1
+            rows = [item[0] for item in batch]
+            try:
+                results = await loop.run_in_executor(None, solve_batch, rows, self.backend)
+            except Exception:
+                # one bad system must not fail the rest: solve them one by one
+                results = []
+                for r in rows:
+                    try:
+                        results.extend(solve_batch([r], self.backend))
+                    except Exception as e:
+                        results.append(e)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _solve_response(self, result):
+        if isinstance(result, Exception):
+            return {'error': str(result)}
+        if isinstance(result, str):
+            return {'status': STATUS_BY_MSG[result]}
+        return {'status': 'unique', 'solution': [json_number(x) for x in result]}
+
+    # geometry queries, answered without going through the batcher
+    def _geometry(self, request):
+        op = request['op']
+        if op == 'intersection':
+            (a, b, k1), (c, d, k2) = request['lines']
+            result = Line([a, b], k1).intersect_with_at(Line([c, d], k2))
+            return result if isinstance(result, str) else [json_number(x) for x in result]
+        if op == 'parallel':
+            v, w = (Vector(x, self.vector_backend) for x in request['vectors'])
+            return bool(v.is_parallel_to(w))
+        if op == 'projection':
+            v = Vector(request['vector'], self.vector_backend)
+            result = v.vector_projections(Vector(request['base'], self.vector_backend))
+            if isinstance(result, str):
+                # a zero base vector
+                raise ValueError(result)
+            return [json_number(x) for x in result]
+        if op == 'stats':
+            return self.stats()
+        raise ValueError(self.UNKNOWN_OP_MSG.format(op))
+
+    async def handle(self, line):
+        start = time.perf_counter()
+        response = {}
+        try:
+            request = json.loads(line)
+            response['id'] = request.get('id')
+            if request.get('op') == 'solve':
+                if len(request['coefficients']) != len(request['constants']):
+                    raise ValueError('one constant per equation is needed')
+                rows = [list(a) + [b] for a, b in zip(request['coefficients'], request['constants'])]
+                future = asyncio.get_running_loop().create_future()
+                await self.queue.put((rows, future))
+                response.update(self._solve_response(await future))
+            else:
+                response['result'] = self._geometry(request)
+        except Exception as e:
+            response['error'] = str(e)
+        self.requests += 1
+        self.latencies.append(time.perf_counter() - start)
+        return response
+
+    # serve one connection; await write(text) sends a response line
+    async def serve_connection(self, reader, write):
+        tasks = set()
+        slots = asyncio.Semaphore(IN_FLIGHT)
+
+        async def respond(line):
+            try:
+                await write(json.dumps(await self.handle(line)) + '\n')
+            finally:
+                slots.release()
+                self.room.release()
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            await slots.acquire()
+            await self.room.acquire()
+            task = asyncio.ensure_future(respond(line))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def _start(self):
+        self.queue = asyncio.Queue(self.queue_size)
+        self.room = asyncio.Semaphore(self.queue_size)
+        return asyncio.ensure_future(self.batcher())
+
+    # path is replaced only if it is a stale socket, never another file
+    async def serve_unix(self, path):
+        if os.path.exists(path) and not stat.S_ISSOCK(os.stat(path).st_mode):
+            raise ValueError(self.NOT_A_SOCKET_MSG.format(path))
+        batcher = await self._start()
+
+        async def on_client(reader, writer):
+            async def write(text):
+                writer.write(text.encode())
+                await writer.drain()
+
+            try:
+                await self.serve_connection(reader, write)
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(on_client, path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+    async def serve_stdio(self):
+        batcher = await self._start()
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+        async def write(text):
+            sys.stdout.write(text)
+            sys.stdout.flush()
+
+        try:
+            await self.serve_connection(reader, write)
+        finally:
+            batcher.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve linear system solves over a socket or stdio.')
+    parser.add_argument('--socket', help='Unix socket path (default: serve stdin/stdout)')
+    parser.add_argument('-b', '--backend', choices=(DECIMAL, FLOAT, EXACT), default=FLOAT,
+                        help='arithmetic used for solving (default: float)')
+    parser.add_argument('--batch', type=int, default=BATCH_SIZE, help='most systems per batch')
+    parser.add_argument('--wait', type=float, default=BATCH_WAIT,
+                        help='seconds a batch waits for more systems')
+    parser.add_argument('--queue', type=int, default=QUEUE_SIZE,
+                        help='unanswered requests before readers are paused')
+    parser.add_argument('--test', action='store_true', help='run the test code and exit')
+    args = parser.parse_args(argv)
+    if args.test:
+        _test()
+        return 0
+
+    daemon = SolverDaemon(args.backend, args.batch, args.wait, args.queue)
+    try:
+        if args.socket:
+            asyncio.run(daemon.serve_unix(args.socket))
+        else:
+            asyncio.run(daemon.serve_stdio())
+    except KeyboardInterrupt:
+        pass
+    except ValueError as e:
+        parser.error(str(e))
+    sys.stderr.write(json.dumps(daemon.stats()) + '\n')
+    return 0
+
+
+# test code
+def _test():
+    async def ask(daemon, request):
+        return await daemon.handle(json.dumps(request))
+
+    for backend in (DECIMAL, FLOAT, EXACT):
+        daemon = SolverDaemon(backend)
+        parallel = asyncio.run(ask(daemon, {'op': 'parallel', 'vectors': [[1, 2], [-2, -4]]}))
+        projection = asyncio.run(ask(daemon, {'op': 'projection', 'vector': [3, 4], 'base': [1, 0]}))
+        if parallel.get('result') is not True or 'error' in projection:
+            print('geometry test failed for', backend)
+        # a zero base vector is an error reply, not a list of characters
+        zero = asyncio.run(ask(daemon, {'op': 'projection', 'vector': [3, 4], 'base': [0, 0]}))
+        if zero.get('error') != 'base vector can not be zero vector' or 'result' in zero:
+            print('zero base test failed for', backend)
+
+    # with --queue requests unanswered (no batcher runs here) the reader
+    # stops reading: of five solves two are queued, the third waits for
+    # room and the last two stay unread
+    async def backlog():
+        daemon = SolverDaemon(queue_size=2)
+        daemon.queue = asyncio.Queue(daemon.queue_size)
+        daemon.room = asyncio.Semaphore(daemon.queue_size)
+        reader = asyncio.StreamReader()
+        for i in range(5):
+            request = {'id': i, 'op': 'solve', 'coefficients': [[1]], 'constants': [1]}
+            reader.feed_data(json.dumps(request).encode() + b'\n')
+        reader.feed_eof()
+
+        async def write(text):
+            pass
+
+        serving = asyncio.ensure_future(daemon.serve_connection(reader, write))
+        await asyncio.sleep(0.05)
+        unread = (await reader.read()).count(b'\n')
+        serving.cancel()
+        return daemon.queue.qsize(), unread
+
+    if asyncio.run(backlog()) != (2, 2):
+        print('backpressure test failed')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+# Binary files of vector sets and linear systems that open with mmap.
+#
+#     save_vectors('points.lalg', batch)       # VectorBatch, Vectors or (N, d) array
+#     batch = load_vectors('points.lalg')      # VectorBatch over the mapped file
+#     save_systems('systems.lalg', stack)      # (k, m, n + 1) augmented matrices
+#     stack = load_systems('systems.lalg')     # (k, m, n + 1) memmap
+#
+# A file is a 64 byte header followed by the values in C order:
+#
+#     magic    4 bytes  b'LALG'
+#     version  uint16   1
+#     kind     uint16   0 = vectors (N, d), 1 = systems (k, m, n + 1)
+#     dtype    8 bytes  numpy dtype string, e.g. b'<f8', zero padded
+#     ndim     uint64
+#     shape    3 x uint64 (unused dimensions are 0)
+#     padding  up to 64 bytes
+#
+# all little-endian. Loading maps the file read-only: nothing is parsed or
+# copied, pages are read on first touch, and processes that map the same
+# file share one copy in the page cache.
+import struct
+
+import numpy as np
+
+from vector import Vector, FLOAT
+from vectorbatch import VectorBatch
+from linsys import AugmentedMatrix
+
+MAGIC = b'LALG'
+VERSION = 1
+VECTORS, SYSTEMS = 0, 1
+HEADER = struct.Struct('<4sHH8sQ3Q')
+HEADER_SIZE = 64
+SUFFIX = '.lalg'
+
+NOT_A_DATASET_MSG = 'Not a linear algebra dataset file'
+WRONG_KIND_MSG = 'The file holds {} not {}'
+KIND_NAMES = {VECTORS: 'vectors', SYSTEMS: 'systems'}
+
+
+def _write_header(f, kind, dtype, shape):
+    dtype = np.dtype(dtype).newbyteorder('<').str.encode()
+    padded = tuple(shape) + (0,) * (3 - len(shape))
+    f.write(HEADER.pack(MAGIC, VERSION, kind, dtype, len(shape), *padded).ljust(HEADER_SIZE, b'\0'))
+
+
+# (kind, dtype, shape) of a dataset file
+def read_header(path):
+    with open(path, 'rb') as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise ValueError(NOT_A_DATASET_MSG)
+    magic, version, kind, dtype, ndim, *shape = HEADER.unpack(raw[:HEADER.size])
+    if magic != MAGIC or version != VERSION or kind not in KIND_NAMES:
+        raise ValueError(NOT_A_DATASET_MSG)
+    return kind, np.dtype(dtype.rstrip(b'\0').decode()), tuple(shape[:ndim])
+
+
+# the values of a dataset file as a memmap (mode 'r', 'r+' or 'c')
+def open_dataset(path, kind=None, mode='r'):
+    file_kind, dtype, shape = read_header(path)
+    if kind is not None and kind != file_kind:
+        raise ValueError(WRONG_KIND_MSG.format(KIND_NAMES[file_kind], KIND_NAMES[kind]))
+    if 0 in shape:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode=mode, offset=HEADER_SIZE, shape=shape)
+
+
+# Make an empty dataset file of the given shape and return it mapped for
+# writing, so data bigger than memory can be filled in piece by piece.
+def create_dataset(path, kind, shape, dtype=np.float64):
+    with open(path, 'wb') as f:
+        _write_header(f, kind, dtype, shape)
+        f.truncate(HEADER_SIZE + int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    return open_dataset(path, kind, mode='r+')
+
+
+def _save(path, kind, data):
+    data = np.ascontiguousarray(data)
+    with open(path, 'wb') as f:
+        _write_header(f, kind, data.dtype, data.shape)
+        data.tofile(f)
+
+
+def save_vectors(path, vectors, dtype=np.float64):
+    if isinstance(vectors, VectorBatch):
+        data = vectors.data
+    elif len(vectors) and isinstance(vectors[0], Vector):
+        data = VectorBatch.from_vectors(vectors).data
+    else:
+        data = np.asarray(vectors)
+    data = np.asarray(data, dtype=dtype)
+    if data.ndim != 2:
+        raise ValueError(VectorBatch.DIMENSIONS_MUST_MATCH_MSG)
+    _save(path, VECTORS, data)
+
+
+# systems: a (k, m, n + 1) array of augmented matrices or a list of
+# LinearSystems that all have the same shape
+def save_systems(path, systems, dtype=np.float64):
+    if not isinstance(systems, np.ndarray):
+        systems = [AugmentedMatrix.from_planes(s.planes, FLOAT).data if hasattr(s, 'planes') else s
+                   for s in systems]
+    data = np.asarray(systems, dtype=dtype)
+    if data.ndim != 3:
+        raise ValueError('Systems must all have the same number of equations and variables')
+    _save(path, SYSTEMS, data)
+
+
+# a VectorBatch whose data is the mapped file (float64 files are not copied)
+def load_vectors(path):
+    return VectorBatch(open_dataset(path, VECTORS))
+
+
+def load_systems(path):
+    return open_dataset(path, SYSTEMS)
+
+
+if __name__ == '__main__':
+    # test code
+    import os
+    import tempfile
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'vectors' + SUFFIX)
+    save_vectors(path, [Vector([1, 2, 3]), Vector([4, 5, 6])])
+    print(read_header(path), load_vectors(path).magnitude())
+    path = os.path.join(directory, 'systems' + SUFFIX)
+    save_systems(path, np.arange(24.0).reshape(2, 3, 4))
+    print(load_systems(path)[1])
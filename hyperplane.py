@@ -0,0 +1,196 @@
+from decimal import Decimal, getcontext
+
+from vector import Vector
+from instrument import timed
+
+getcontext().prec = 30
+
+
+# n-dimensional hyperplane  a_1 x_1 + ... + a_n x_n = k.  The coefficients
+# live in one Vector (a Decimal tuple, or a float64 array for the float
+# backend) and the basepoint is only worked out when somebody asks for it.
+# Line and Plane are the 2- and 3-dimensional cases.
+class Hyperplane(object):
+
+    NO_NONZERO_ELTS_FOUND_MSG = 'No nonzero elements found'
+    EITHER_DIM_OR_NORMAL_VEC_MUST_BE_PROVIDED_MSG = 'Either the dimension or the normal vector must be provided'
+    DIMENSION_MISMATCH_MSG = 'The normal vector does not match the dimension'
+
+    def __init__(self, dimension=None, normal_vector=None, constant_term=None, backend=None):
+        if dimension is None and normal_vector is None:
+            raise ValueError(self.EITHER_DIM_OR_NORMAL_VEC_MUST_BE_PROVIDED_MSG)
+
+        if normal_vector is None:
+            normal_vector = Vector(['0']*dimension, backend)
+        elif not isinstance(normal_vector, Vector) or (backend and normal_vector.backend != backend):
+            normal_vector = Vector(normal_vector, backend)
+        if dimension is not None and normal_vector.dimension != dimension:
+            raise ValueError(self.DIMENSION_MISMATCH_MSG)
+
+        self.dimension = normal_vector.dimension
+        self._normal_vector = normal_vector # initial to set a normal vector
+
+        if not constant_term:
+            constant_term = Decimal('0')
+        self._constant_term = Decimal(constant_term) # initial to set a value
+
+        self._basepoint = None
+        self._basepoint_is_set = False
+
+
+    # changing the coefficients or the constant only marks the basepoint stale
+    @property
+    def normal_vector(self):
+        return self._normal_vector
+
+    @normal_vector.setter
+    def normal_vector(self, normal_vector):
+        if not isinstance(normal_vector, Vector):
+            normal_vector = Vector(normal_vector, self._normal_vector.backend)
+        self._normal_vector = normal_vector
+        self._basepoint_is_set = False
+
+    @property
+    def constant_term(self):
+        return self._constant_term
+
+    @constant_term.setter
+    def constant_term(self, constant_term):
+        self._constant_term = Decimal(constant_term)
+        self._basepoint_is_set = False
+
+    @property
+    def basepoint(self):
+        if not self._basepoint_is_set:
+            self.set_basepoint()
+        return self._basepoint
+
+
+    @timed('set_basepoint')
+    def set_basepoint(self):
+        try:
+            n = self.normal_vector
+            c = self.constant_term
+            basepoint_coords = ['0']*self.dimension
+
+            initial_index = Hyperplane.first_nonzero_index(n)
+            initial_coefficient = Decimal(n[initial_index])
+
+            basepoint_coords[initial_index] = c/initial_coefficient  # becasue c is decimal, so initial_coefficient needs to be decimal
+            self._basepoint = Vector(basepoint_coords, n.backend)
+
+        except Exception as e:
+            if str(e) == Hyperplane.NO_NONZERO_ELTS_FOUND_MSG:
+                self._basepoint = None
+            else:
+                raise e
+        self._basepoint_is_set = True
+
+
+    def __str__(self):
+
+        num_decimal_places = 3
+
+        def write_coefficient(coefficient, is_initial_term=False):
+            coefficient = round(coefficient, num_decimal_places)
+            if coefficient % 1 == 0:
+                coefficient = int(coefficient)
+
+            output = ''
+
+            if coefficient < 0:
+                output += '-'
+            if coefficient > 0 and not is_initial_term:
+                output += '+'
+
+            if not is_initial_term:
+                output += ' '
+
+            if abs(coefficient) != 1:
+                output += '{}'.format(abs(coefficient))
+
+            return output
+
+        n = self.normal_vector
+
+        try:
+            initial_index = Hyperplane.first_nonzero_index(n)
+            terms = [write_coefficient(n[i], is_initial_term=(i==initial_index)) + 'x_{}'.format(i+1)
+                     for i in range(self.dimension) if round(n[i], num_decimal_places) != 0]
+            output = ' '.join(terms)
+
+        except Exception as e:
+            if str(e) == self.NO_NONZERO_ELTS_FOUND_MSG:
+                output = '0'
+            else:
+                raise e
+
+        constant = round(self.constant_term, num_decimal_places)
+        if constant % 1 == 0:
+            constant = int(constant)
+        output += ' = {}'.format(constant) # put value of constant into {}
+
+        return output
+
+    # determine if 2 hyperplanes are paralle
+    #(check if their normal vectors are parallel)
+    def is_paralle_to(self, plane):
+        return self.normal_vector.is_parallel_to(plane.normal_vector)
+
+    # determine if 2 hyperplanes are equal
+    #(the vector connecting one point on each plane is orthogonal to the plane's normal vector)
+    def __eq__(self, plane):
+       if self.normal_vector.is_zero():
+           if not plane.normal_vector.is_zero():
+               return False
+           else:
+               diff = self.constant_term - plane.constant_term
+               return MyDecimal(diff).is_near_zero()
+       elif plane.normal_vector.is_zero():
+           return False
+
+       if not self.is_paralle_to(plane):
+           return False
+
+       p1= self.basepoint
+       p2= plane.basepoint
+       p2_p1_vector = p2.minus(p1)
+       return p2_p1_vector.orthogonal(self.normal_vector)
+
+
+    # the same hyperplane with a unit normal whose first nonzero coefficient
+    # is positive, the constant scaled to match; identical hyperplanes have
+    # (up to rounding) identical canonical forms
+    def canonical_form(self):
+        n = self.normal_vector
+        if n.is_zero():
+            return self
+        scale = 1 / n.magnitude()
+        if n[Hyperplane.first_nonzero_index(n)] < 0:
+            scale = -scale
+        return self.__class__(normal_vector=n.scalar(scale),
+                              constant_term=self.constant_term * Decimal(scale))
+
+
+    @staticmethod
+    def first_nonzero_index(iterable):
+        for k, item in enumerate(iterable):
+            if not MyDecimal(item).is_near_zero():
+                return k
+        raise Exception(Hyperplane.NO_NONZERO_ELTS_FOUND_MSG)
+
+
+class MyDecimal(Decimal):
+    def is_near_zero(self, eps=1e-10):
+        return abs(self) < eps
+
+
+if __name__ == '__main__':
+    # test code
+    h1 = Hyperplane(normal_vector=[1, 2, 3, 4], constant_term=10)
+    h2 = Hyperplane(normal_vector=[2, 4, 6, 8], constant_term=20)
+    h3 = Hyperplane(dimension=4)
+    print(h1)
+    print(h1.basepoint)
+    print(h1 == h2, h1 == h3, h3 == Hyperplane(dimension=4))
+    print(h2.canonical_form())
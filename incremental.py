@@ -0,0 +1,219 @@
+from decimal import Decimal
+
+import numpy as np
+
+import vector
+from vector import Vector, FLOAT
+from linsys import LinearSystem
+
+
+# A linear system that keeps its reduced row echelon form up to date while
+# equations are added, removed or replaced, for loops that change one
+# equation and re-solve.
+#
+# The state is R = E M: M holds the equations in [A | b] form, R is reduced
+# (every pivot is 1 and the only nonzero entry of its column) and E records
+# which combination of the equations every row of R is. A new equation is
+# reduced against the pivot rows and may become a pivot itself; removing
+# equation i first makes a single row of R depend on it (using column i of
+# E), then drops that row and repairs the echelon form. Each change is a
+# handful of rank-one updates, O(m (m + n)), instead of a new elimination.
+#
+# Float rounding accumulates over many changes; refresh() rebuilds R and E
+# from the equations. The decimal backend keeps 30 digits throughout.
+class IncrementalLinearSystem(object):
+
+    NEAR_ZERO_EPS = 1e-10
+    # remove() eliminates with an entry of E at most this many times smaller
+    # than the largest one in the column it clears
+    DEPENDENCE_RATIO = 10
+    DIMENSION_MISMATCH_MSG = LinearSystem.ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG
+    NO_SOLUTIONS_MSG = LinearSystem.NO_SOLUTIONS_MSG
+    INF_SOLUTIONS_MSG = LinearSystem.INF_SOLUTIONS_MSG
+
+    def __init__(self, dimension, planes=(), backend=None):
+        self.dimension = dimension
+        self.backend = backend or vector.default_backend
+        self.planes = []
+        self._dtype = np.float64 if self.backend == FLOAT else object
+        self.rows = np.zeros((0, dimension + 1), dtype=self._dtype)
+        self.combinations = np.zeros((0, 0), dtype=self._dtype)
+        self.pivots = []  # pivot column of every row of R, -1 for none
+        for p in planes:
+            self.add(p)
+
+
+    @classmethod
+    def from_linear_system(cls, system):
+        return cls(system.dimension, list(system.planes), system.backend)
+
+
+    def to_linear_system(self):
+        return LinearSystem(list(self.planes), self.backend)
+
+
+    def __len__(self):
+        return len(self.planes)
+
+
+    def __getitem__(self, i):
+        return self.planes[i]
+
+
+    def is_near_zero(self, x):
+        return abs(x) < self.NEAR_ZERO_EPS
+
+
+    def _row(self, plane):
+        if plane.dimension != self.dimension:
+            raise Exception(self.DIMENSION_MISMATCH_MSG)
+        values = list(plane.normal_vector) + [plane.constant_term]
+        if self.backend == FLOAT:
+            return np.array([float(x) for x in values])
+        return np.array([Decimal(x) for x in values], dtype=object)
+
+
+    def _zero(self, shape):
+        if self.backend == FLOAT:
+            return np.zeros(shape)
+        return np.full(shape, Decimal(0), dtype=object)
+
+
+    # make row r the pivot row of column col and clear col from all the others
+    def _pivot(self, r, col):
+        pivot = self.rows[r, col]
+        self.rows[r] /= pivot
+        self.combinations[r] /= pivot
+        self.rows[r, col] = 1
+        factors = self.rows[:, col].copy()
+        factors[r] = 0
+        self.rows -= np.outer(factors, self.rows[r])
+        self.combinations -= np.outer(factors, self.combinations[r])
+        self.rows[np.arange(len(self.rows)) != r, col] = 0
+        self.pivots[r] = col
+
+
+    # pivot column for a row with no pivot yet: the largest coefficient
+    def _pivot_column(self, r):
+        coefficients = np.abs(self.rows[r, :-1])
+        col = int(np.argmax(coefficients)) if len(coefficients) else 0
+        if not len(coefficients) or self.is_near_zero(coefficients[col]):
+            return -1
+        return col
+
+
+    # append an equation (at the end, or at position i of the equations)
+    def add(self, plane, position=None):
+        row = self._row(plane)
+        m = len(self.planes)
+        position = m if position is None else position
+
+        combination = self._zero(m + 1)
+        combination[position] = 1
+        pivot_rows = [r for r, col in enumerate(self.pivots) if col >= 0]
+        factors = row[[self.pivots[r] for r in pivot_rows]]
+        combinations = np.insert(self.combinations, position, 0, axis=1) if m else self._zero((0, 1))
+        if pivot_rows:
+            row = row - factors @ self.rows[pivot_rows]
+            combination = combination - factors @ combinations[pivot_rows]
+
+        self.planes.insert(position, plane)
+        self.rows = np.vstack([self.rows, row])
+        self.combinations = np.vstack([combinations, combination])
+        self.pivots.append(-1)
+
+        col = self._pivot_column(m)
+        if col >= 0:
+            self._pivot(m, col)
+
+
+    # drop equation i and return it
+    def remove(self, i):
+        # E is invertible, so some row depends on equation i. Sizes in E
+        # follow the scale of the equations, so the choice is relative to
+        # the largest: a row without a pivot is preferred (dropping it leaves
+        # the rank alone) unless it is far smaller, which would blow up the
+        # factors below.
+        dependence = np.abs(self.combinations[:, i])
+        largest = max(dependence)
+        free = [r for r in range(len(self.rows))
+                if self.pivots[r] < 0 and dependence[r] * self.DEPENDENCE_RATIO >= largest]
+        j = max(free or range(len(self.rows)), key=lambda r: dependence[r])
+
+        # only row j may depend on equation i ...
+        factors = self.combinations[:, i] / self.combinations[j, i]
+        factors[j] = 0
+        self.rows -= np.outer(factors, self.rows[j])
+        self.combinations -= np.outer(factors, self.combinations[j])
+
+        # ... so dropping it (and column i of E) leaves R = E M for the rest
+        keep = np.arange(len(self.rows)) != j
+        self.rows = self.rows[keep]
+        self.combinations = np.delete(self.combinations[keep], i, axis=1)
+        del self.pivots[j]
+        plane = self.planes.pop(i)
+
+        # rows that were zero may have picked up a multiple of row j
+        for r in range(len(self.rows)):
+            if self.pivots[r] < 0:
+                col = self._pivot_column(r)
+                if col >= 0:
+                    self._pivot(r, col)
+        return plane
+
+
+    def replace(self, i, plane):
+        old = self.remove(i)
+        self.add(plane, position=i)
+        return old
+
+
+    # rebuild R and E from the equations, clearing accumulated rounding
+    def refresh(self):
+        planes = self.planes
+        self.__init__(self.dimension, (), self.backend)
+        for p in planes:
+            self.add(p)
+
+
+    def rank(self):
+        return sum(1 for col in self.pivots if col >= 0)
+
+
+    # rows of R reduced to 0 = k with k nonzero
+    def is_inconsistent(self):
+        return any(col < 0 and not self.is_near_zero(self.rows[r, -1])
+                   for r, col in enumerate(self.pivots))
+
+
+    # same results as LinearSystem.compute_solution, read off R directly
+    def compute_solution(self):
+        if self.is_inconsistent():
+            return self.NO_SOLUTIONS_MSG
+        if self.rank() < self.dimension:
+            return self.INF_SOLUTIONS_MSG
+        solution = [0] * self.dimension
+        for r, col in enumerate(self.pivots):
+            if col >= 0:
+                solution[col] = self.rows[r, -1]
+        return Vector(solution, self.backend)
+
+
+    def __str__(self):
+        return 'Incremental Linear System: {} equations, {} variables, rank {}'.format(
+            len(self), self.dimension, self.rank())
+
+
+if __name__ == '__main__':
+    # test code
+    from plane import Plane
+    s = IncrementalLinearSystem(3, [Plane([1, 1, 1], 1), Plane([0, 1, 0], 2)])
+    print(s, s.compute_solution())
+    s.add(Plane([1, 1, -1], 3))
+    print(s, s.compute_solution())
+    s.add(Plane([1, 0, -2], 2))
+    print(s.compute_solution())
+    s.remove(1)
+    print(s, s.compute_solution())
+    s.replace(0, Plane([1, 1, 1], 5))
+    print(s.compute_solution(), s.to_linear_system().compute_solution())
@@ -0,0 +1,89 @@
+import functools
+from collections import defaultdict
+from time import perf_counter
+
+
+# the stats object currently collecting; None means instrumentation is off
+# and an instrumented call costs one global lookup on top of the call itself
+_active = None
+
+
+# Counters and timers for the elimination hot paths. Use it as a context
+# manager (or enable()/disable()) around the code to look at:
+#
+#     with EliminationStats() as stats:
+#         system.compute_solution()
+#     stats.as_dict()   # {'swap_rows': {'count': 2, 'seconds': ...}, ...}
+#
+# callback(name, seconds) is called after every recorded operation, e.g. to
+# feed a metrics pipeline. Times of nested operations are inclusive.
+class EliminationStats(object):
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.counts = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self._previous = []
+
+    def record(self, name, seconds):
+        self.counts[name] += 1
+        self.seconds[name] += seconds
+        if self.callback is not None:
+            self.callback(name, seconds)
+
+    def reset(self):
+        self.counts.clear()
+        self.seconds.clear()
+
+    def as_dict(self):
+        return {name: {'count': self.counts[name], 'seconds': self.seconds[name]}
+                for name in sorted(self.counts)}
+
+    def __enter__(self):
+        global _active
+        self._previous.append(_active)
+        _active = self
+        return self
+
+    def __exit__(self, *exc):
+        global _active
+        _active = self._previous.pop()
+        return False
+
+    def __str__(self):
+        lines = ['{:<32} {:>10} {:>12}'.format('operation', 'count', 'seconds')]
+        for name, values in self.as_dict().items():
+            lines.append('{:<32} {:>10} {:>12.6f}'.format(name, values['count'], values['seconds']))
+        return '\n'.join(lines)
+
+
+def enable(stats=None):
+    global _active
+    _active = stats if stats is not None else EliminationStats()
+    return _active
+
+
+def disable():
+    global _active
+    _active = None
+
+
+def active_stats():
+    return _active
+
+
+# decorator: count and time every call under `name` while stats are enabled
+def timed(name):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            stats = _active
+            if stats is None:
+                return fn(*args, **kwargs)
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stats.record(name, perf_counter() - start)
+        return wrapper
+    return decorate
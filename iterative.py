@@ -0,0 +1,176 @@
+import numpy as np
+
+from vector import Vector, FLOAT
+
+
+# Outcome of an iterative solve: the float solution, whether the relative
+# residual ||b - A x|| / ||b|| fell below the tolerance, the number of
+# iterations used and the residual after every iteration.
+class IterativeResult(object):
+
+    def __init__(self, x, converged, iterations, residuals):
+        self.solution = Vector(x, FLOAT)
+        self.converged = converged
+        self.iterations = iterations
+        self.residuals = residuals
+
+    @property
+    def residual(self):
+        return self.residuals[-1]
+
+    def as_dict(self):
+        return {'converged': self.converged, 'iterations': self.iterations,
+                'residual': self.residual}
+
+    def __str__(self):
+        return '{} after {} iterations (relative residual {:.3e})'.format(
+            'converged' if self.converged else 'not converged', self.iterations, self.residual)
+
+
+# The system as float arrays and callables: a LinearSystem (made dense), a
+# SparseLinearSystem (kept in CSR, only matvec and row slices are used) or
+# an (A, b) pair of arrays.
+class _Operator(object):
+
+    SQUARE_SYSTEM_MSG = 'Iterative solvers need as many equations as variables'
+    ZERO_DIAGONAL_MSG = 'Jacobi and Gauss-Seidel need a nonzero diagonal'
+
+    def __init__(self, system):
+        self.dense = None
+        self.sparse = None
+        if isinstance(system, tuple):
+            self.dense = np.asarray(system[0], dtype=np.float64)
+            self.b = np.asarray(system[1], dtype=np.float64)
+        elif hasattr(system, 'matvec'):
+            self.sparse = system
+            self.b = np.asarray(system.constants, dtype=np.float64)
+        else:
+            self.dense = np.array([[float(x) for x in p.normal_vector] for p in system.planes])
+            self.b = np.array([float(p.constant_term) for p in system.planes])
+
+        self.dimension = system.dimension if self.sparse is not None else self.dense.shape[1]
+        if len(self.b) != self.dimension:
+            raise ValueError(self.SQUARE_SYSTEM_MSG)
+
+    def matvec(self, x):
+        if self.sparse is not None:
+            return self.sparse.matvec(x)
+        return self.dense @ x
+
+    def diagonal(self):
+        if self.sparse is None:
+            return np.diag(self.dense).copy()
+        s = self.sparse
+        row_ids = np.repeat(np.arange(len(s)), np.diff(s.indptr))
+        d = np.zeros(self.dimension)
+        on_diagonal = s.indices == row_ids
+        np.add.at(d, row_ids[on_diagonal], s.values[on_diagonal])
+        return d
+
+    # column indices and values of row i
+    def row(self, i):
+        if self.sparse is not None:
+            return self.sparse.row(i)
+        return None, self.dense[i]
+
+    def checked_diagonal(self):
+        d = self.diagonal()
+        if np.any(np.abs(d) < 1e-300):
+            raise ValueError(self.ZERO_DIAGONAL_MSG)
+        return d
+
+
+def _start(op, x0):
+    if x0 is None:
+        return np.zeros(op.dimension)
+    if isinstance(x0, IterativeResult):
+        x0 = x0.solution
+    if isinstance(x0, Vector):
+        x0 = x0.coordinates
+    return np.array(x0, dtype=np.float64)
+
+
+def _relative(op, r):
+    b_norm = np.linalg.norm(op.b)
+    return np.linalg.norm(r) / (b_norm if b_norm > 0 else 1.0)
+
+
+# Jacobi iteration  x <- x + D^-1 (b - A x). Converges for strictly
+# diagonally dominant systems; one matvec per iteration.
+def jacobi(system, tol=1e-10, max_iter=1000, x0=None):
+    op = _Operator(system)
+    d = op.checked_diagonal()
+    x = _start(op, x0)
+    r = op.b - op.matvec(x)
+    residuals = [_relative(op, r)]
+    while residuals[-1] > tol and len(residuals) <= max_iter:
+        x += r / d
+        r = op.b - op.matvec(x)
+        residuals.append(_relative(op, r))
+    return IterativeResult(x, residuals[-1] <= tol, len(residuals) - 1, residuals)
+
+
+# Gauss-Seidel sweeps, using every new value as soon as it is known;
+# omega > 1 gives successive over-relaxation (SOR). Converges for diagonally
+# dominant and for symmetric positive definite systems.
+def gauss_seidel(system, tol=1e-10, max_iter=1000, x0=None, omega=1.0):
+    op = _Operator(system)
+    d = op.checked_diagonal()
+    x = _start(op, x0)
+    residuals = [_relative(op, op.b - op.matvec(x))]
+    while residuals[-1] > tol and len(residuals) <= max_iter:
+        for i in range(op.dimension):
+            cols, values = op.row(i)
+            ax = values @ (x if cols is None else x[cols])
+            x[i] += omega * (op.b[i] - ax) / d[i]
+        residuals.append(_relative(op, op.b - op.matvec(x)))
+    return IterativeResult(x, residuals[-1] <= tol, len(residuals) - 1, residuals)
+
+
+# Preconditioned conjugate gradient for symmetric positive definite systems.
+# preconditioner is None, 'jacobi' (divide by the diagonal) or a callable
+# z = M^-1 r. Stops early, unconverged, if the system turns out not to be
+# positive definite (p . A p <= 0).
+def conjugate_gradient(system, tol=1e-10, max_iter=None, x0=None, preconditioner=None):
+    op = _Operator(system)
+    if max_iter is None:
+        max_iter = 10 * op.dimension
+    if preconditioner == 'jacobi':
+        d = op.checked_diagonal()
+        preconditioner = lambda r: r / d
+    elif preconditioner is None:
+        preconditioner = lambda r: r
+
+    x = _start(op, x0)
+    r = op.b - op.matvec(x)
+    z = preconditioner(r)
+    p = z.copy()
+    rz = r @ z
+    residuals = [_relative(op, r)]
+    while residuals[-1] > tol and len(residuals) <= max_iter:
+        ap = op.matvec(p)
+        curvature = p @ ap
+        if curvature <= 0:
+            break
+        alpha = rz / curvature
+        x += alpha * p
+        r -= alpha * ap
+        residuals.append(_relative(op, r))
+        z = preconditioner(r)
+        rz, rz_old = r @ z, rz
+        p = z + (rz / rz_old) * p
+    return IterativeResult(x, residuals[-1] <= tol, len(residuals) - 1, residuals)
+
+
+METHODS = {'jacobi': jacobi, 'gauss_seidel': gauss_seidel, 'cg': conjugate_gradient}
+
+
+if __name__ == '__main__':
+    # test code
+    a = [[4, -1, 0], [-1, 4, -1], [0, -1, 4]]
+    b = [2, 4, 10]
+    for method in (jacobi, gauss_seidel, conjugate_gradient):
+        result = method((a, b))
+        print(method.__name__, result.solution, result)
+    warm = conjugate_gradient((a, b), x0=result, preconditioner='jacobi')
+    print(warm.iterations)
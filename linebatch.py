@@ -0,0 +1,243 @@
+import math
+
+import numpy as np
+
+from line import Line
+
+# status codes of a pair of lines
+UNIQUE, PARALLEL, COINCIDENT = 0, 1, 2
+
+# candidate pairs intersected per step in all_intersections
+PAIR_BATCH = 1 << 20
+# a point this close to a cell edge (in cell widths) touches both cells
+CELL_EPS = 1e-9
+
+
+# N lines  A x + B y = k  stored as one (N, 3) float64 array of [A, B, k] rows
+class LineBatch(object):
+
+    ROWS_MUST_BE_LINES_MSG = 'A line batch needs rows of [A, B, k]'
+
+    def __init__(self, data):
+        data = np.ascontiguousarray(data, dtype=np.float64)
+        if data.ndim != 2 or data.shape[1] != 3:
+            raise ValueError(self.ROWS_MUST_BE_LINES_MSG)
+        self.data = data
+
+    @classmethod
+    def from_lines(cls, lines):
+        return cls([[float(x) for x in l.normal_vector] + [float(l.constant_term)] for l in lines])
+
+    def to_lines(self):
+        return [Line(list(row[:2]), row[2]) for row in self.data]
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            row = self.data[i]
+            return Line(list(row[:2]), row[2])
+        return LineBatch(self.data[i])
+
+    # intersect row i of this batch with row i of other (or with one Line)
+    def intersect_with(self, other, tolerance=1e-10):
+        if isinstance(other, Line):
+            other = LineBatch.from_lines([other]).data
+        elif isinstance(other, LineBatch):
+            other = other.data
+        return intersect_pairs(self.data, other, tolerance)
+
+    def all_intersections(self, bbox, cells=None, tolerance=1e-10):
+        return all_intersections(self.data, bbox, cells, tolerance)
+
+
+# Cramer's rule for N pairs at once. Returns (points, status): points is
+# (N, 2) with nan rows where there is no single intersection, status holds
+# UNIQUE, PARALLEL (no common point) or COINCIDENT (same line) per pair.
+# The parallel test is relative to the coefficient sizes, so it does not
+# depend on how the equations are scaled.
+def intersect_pairs(first, second, tolerance=1e-10):
+    first = np.asarray(first, dtype=np.float64)
+    second = np.asarray(second, dtype=np.float64)
+    a, b, k1 = first[..., 0], first[..., 1], first[..., 2]
+    c, d, k2 = second[..., 0], second[..., 1], second[..., 2]
+
+    det = a * d - b * c
+    scale = np.hypot(a, b) * np.hypot(c, d)
+    parallel = np.abs(det) <= tolerance * scale
+
+    # parallel rows describe the same line when the constants scale the same way
+    full_scale = np.sqrt(a * a + b * b + k1 * k1) * np.sqrt(c * c + d * d + k2 * k2)
+    coincident = parallel & (np.abs(a * k2 - c * k1) <= tolerance * full_scale) \
+        & (np.abs(b * k2 - d * k1) <= tolerance * full_scale)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x = (d * k1 - b * k2) / det
+        y = -(c * k1 - a * k2) / det
+    points = np.stack([x, y], axis=-1)
+    points[parallel] = np.nan
+
+    status = np.full(det.shape, UNIQUE, dtype=np.int8)
+    status[parallel] = PARALLEL
+    status[coincident] = COINCIDENT
+    return points, status
+
+
+# the part of each line inside the box as a segment (x0, y0, x1, y1);
+# rows of lines that miss the box are nan
+def clip_to_box(lines, bbox):
+    xmin, ymin, xmax, ymax = bbox
+    a, b, k = lines[:, 0], lines[:, 1], lines[:, 2]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # where the line meets the four box edges
+        y_at_xmin = (k - a * xmin) / b
+        y_at_xmax = (k - a * xmax) / b
+        x_at_ymin = (k - b * ymin) / a
+        x_at_ymax = (k - b * ymax) / a
+    candidates = np.stack([
+        np.stack([np.full_like(a, xmin), y_at_xmin], -1),
+        np.stack([np.full_like(a, xmax), y_at_xmax], -1),
+        np.stack([x_at_ymin, np.full_like(a, ymin)], -1),
+        np.stack([x_at_ymax, np.full_like(a, ymax)], -1),
+    ], axis=1)
+    eps = 1e-12 * max(xmax - xmin, ymax - ymin)
+    inside = (np.isfinite(candidates).all(-1)
+              & (candidates[..., 0] >= xmin - eps) & (candidates[..., 0] <= xmax + eps)
+              & (candidates[..., 1] >= ymin - eps) & (candidates[..., 1] <= ymax + eps))
+
+    # the two extreme hits along the line direction (-b, a) bound the segment
+    direction = np.stack([-b, a], -1)
+    t = np.einsum('nkj,nj->nk', candidates, direction)
+    low = np.where(inside, t, np.inf).argmin(1)
+    high = np.where(inside, t, -np.inf).argmax(1)
+    rows = np.arange(len(lines))
+    segments = np.concatenate([candidates[rows, low], candidates[rows, high]], axis=1)
+    segments[~inside.any(1)] = np.nan
+    return segments
+
+
+# grid cells the segment touches, as flat cell ids: the cells it crosses
+# plus, where it passes through a cell edge or corner, every cell sharing
+# that edge or corner, so two lines meeting on a grid line share a cell
+def _cells_of_segment(segment, bbox, cells):
+    xmin, ymin, xmax, ymax = bbox
+    x0, y0, x1, y1 = segment
+    width, height = (xmax - xmin) / cells, (ymax - ymin) / cells
+    # parameters where the segment crosses a vertical or horizontal grid line
+    ts = [0.0, 1.0]
+    for start, end, origin, size in ((x0, x1, xmin, width), (y0, y1, ymin, height)):
+        if end != start:
+            first, last = sorted(((start - origin) / size, (end - origin) / size))
+            lines = np.arange(math.ceil(first - CELL_EPS), math.floor(last + CELL_EPS) + 1)
+            ts.extend(((origin + lines * size) - start) / (end - start))
+    ts = np.unique(np.clip(ts, 0.0, 1.0))
+    middle = (ts[:-1] + ts[1:]) / 2 if len(ts) > 1 else ts
+    # cell coordinates of the crossings and of the pieces between them
+    u = (x0 + np.r_[ts, middle] * (x1 - x0) - xmin) / width
+    v = (y0 + np.r_[ts, middle] * (y1 - y0) - ymin) / height
+    cx = np.concatenate([np.floor(u - CELL_EPS), np.floor(u + CELL_EPS)] * 2)
+    cy = np.concatenate([np.floor(v - CELL_EPS)] * 2 + [np.floor(v + CELL_EPS)] * 2)
+    cx = np.clip(cx, 0, cells - 1).astype(np.int64)
+    cy = np.clip(cy, 0, cells - 1).astype(np.int64)
+    return np.unique(cy * cells + cx)
+
+
+# Every intersection point inside bbox = (xmin, ymin, xmax, ymax) among N
+# lines. The lines are clipped to the box and bucketed into a cells x cells
+# grid (about sqrt(N) per side by default); only lines sharing a cell are
+# intersected, and a pair found in several cells is reported once.
+# Work is about N * cells for the bucketing plus the number of candidate
+# pairs, instead of N^2 / 2 pairwise calls.
+# Returns (i, j, points) with i < j, sorted by (i, j).
+def all_intersections(lines, bbox, cells=None, tolerance=1e-10):
+    lines = np.asarray(lines, dtype=np.float64)
+    if cells is None:
+        cells = max(1, int(math.sqrt(len(lines))))
+    segments = clip_to_box(lines, bbox)
+
+    cell_ids = []
+    line_ids = []
+    for i in np.flatnonzero(~np.isnan(segments[:, 0])):
+        crossed = _cells_of_segment(segments[i], bbox, cells)
+        cell_ids.append(crossed)
+        line_ids.append(np.full(len(crossed), i))
+    empty = np.zeros(0, dtype=np.int64)
+    if not cell_ids:
+        return empty, empty, np.zeros((0, 2))
+    cell_ids = np.concatenate(cell_ids)
+    line_ids = np.concatenate(line_ids)
+
+    order = np.argsort(cell_ids, kind='stable')
+    cell_ids, line_ids = cell_ids[order], line_ids[order]
+    starts = np.flatnonzero(np.r_[True, cell_ids[1:] != cell_ids[:-1]])
+    ends = np.r_[starts[1:], len(cell_ids)]
+
+    # candidate pairs are intersected a batch of cells at a time, which keeps
+    # the temporary arrays at about PAIR_BATCH pairs
+    found_i, found_j, found_points = [], [], []
+    first, second = [], []
+    pending = 0
+    for start, end in zip(starts, ends):
+        if end - start < 2:
+            continue
+        members = line_ids[start:end]
+        u, v = np.triu_indices(len(members), 1)
+        first.append(members[u])
+        second.append(members[v])
+        pending += len(u)
+        if pending >= PAIR_BATCH:
+            _keep_intersections(lines, first, second, bbox, tolerance, found_i, found_j, found_points)
+            first, second = [], []
+            pending = 0
+    if first:
+        _keep_intersections(lines, first, second, bbox, tolerance, found_i, found_j, found_points)
+    if not found_i:
+        return empty, empty, np.zeros((0, 2))
+
+    i, j = np.concatenate(found_i), np.concatenate(found_j)
+    points = np.concatenate(found_points)
+    # np.unique sorts the pair keys, which is (i, j) order
+    _, first_seen = np.unique(i * len(lines) + j, return_index=True)
+    return i[first_seen], j[first_seen], points[first_seen]
+
+
+# intersect one batch of candidate pairs and keep the single points inside
+# the box (pairs sharing several cells are repeated, all_intersections
+# drops the copies)
+def _keep_intersections(lines, first, second, bbox, tolerance, found_i, found_j, found_points):
+    xmin, ymin, xmax, ymax = bbox
+    first, second = np.concatenate(first), np.concatenate(second)
+
+    points, status = intersect_pairs(lines[first], lines[second], tolerance)
+    keep = status == UNIQUE
+    px, py = points[:, 0], points[:, 1]
+    eps = 1e-12 * max(xmax - xmin, ymax - ymin)
+    with np.errstate(invalid='ignore'):
+        keep &= (px >= xmin - eps) & (px <= xmax + eps) & (py >= ymin - eps) & (py <= ymax + eps)
+
+    found_i.append(np.minimum(first[keep], second[keep]))
+    found_j.append(np.maximum(first[keep], second[keep]))
+    found_points.append(points[keep])
+
+
+if __name__ == '__main__':
+    # test code
+    lines = LineBatch.from_lines([Line([4.046, 2.836], 1.21), Line([7.204, 3.182], 8.68),
+                                  Line([1.182, 5.562], 6.744)])
+    others = LineBatch.from_lines([Line([10.115, 7.09], 3.025), Line([8.172, 4.114], 9.883),
+                                   Line([1.773, 8.343], 9.525)])
+    print(lines.intersect_with(others))
+    print(lines.all_intersections((-10, -10, 10, 10)))
+
+    # grid-aligned and diagonal lines meet exactly on cell edges and corners;
+    # every cell count must find the same points as intersecting all pairs
+    grid = np.array([[1, 0, c] for c in range(11)] + [[0, 1, c] for c in range(11)]
+                    + [[1, -1, c] for c in range(-9, 10)] + [[1, 1, c] for c in range(1, 20)], float)
+    u, v = np.triu_indices(len(grid), 1)
+    points, status = intersect_pairs(grid[u], grid[v])
+    inside = (status == UNIQUE) & (points >= -1e-9).all(1) & (points <= 10 + 1e-9).all(1)
+    for cells in (1, 5, 10, 20):
+        i, j, _ = all_intersections(grid, (0, 0, 10, 10), cells)
+        if not (np.array_equal(i, u[inside]) and np.array_equal(j, v[inside])):
+            print('grid-aligned intersections test failed for cells={}'.format(cells))
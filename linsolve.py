@@ -0,0 +1,235 @@
+# Solve a stream of linear systems from the command line.
+#
+#     python linsolve.py systems.jsonl -o solutions.jsonl
+#     python linsolve.py --format csv --backend exact < systems.csv
+#
+# Systems are read and solved one at a time and every result is written out
+# before the next system is read, so memory use depends on the size of one
+# system, not on the size of the input file.
+#
+# Input formats:
+#
+#     jsonl   one system per line: {"id": ..., "coefficients": [[...], ...], "constants": [...]}
+#             ("id" is optional and defaults to the line number)
+#     csv     one equation per row: id, a_1, ..., a_n, b; consecutive rows
+#             with the same id form one system
+#     binary  repeated records of two little-endian uint32 (equations m,
+#             variables n) followed by m * (n + 1) little-endian float64
+#             values, the augmented matrix in row order
+#     lalg    a systems file of dataset.py, mapped instead of read; needs
+#             a file name, not stdin
+#
+# Every result is one JSON line: {"id": ..., "status": "unique" | "none" |
+# "infinite", "solution": [...]} ("solution" only for a unique solution), or
+# {"id": ..., "error": "..."} when a system could not be read or solved.
+import argparse
+import csv
+import json
+import struct
+import sys
+from decimal import Decimal
+from itertools import groupby
+
+import numpy as np
+
+import bareiss
+from bareiss import EXACT
+import adaptive
+import dataset
+from vector import DECIMAL, FLOAT
+from linsys import LinearSystem, AugmentedMatrix
+
+ADAPTIVE = 'adaptive'
+FORMATS = ('jsonl', 'csv', 'binary', 'lalg')
+RECORD_HEADER = struct.Struct('<II')
+
+# status word of each LinearSystem message in a JSON result
+STATUS_BY_MSG = {
+    LinearSystem.NO_SOLUTIONS_MSG: 'none',
+    LinearSystem.INF_SOLUTIONS_MSG: 'infinite',
+}
+
+
+CONSTANTS_MSG = 'one constant per equation is needed'
+MISSING_FIELD_MSG = 'missing field {!r}'
+RAGGED_MSG = 'every equation needs the same number of values'
+NOT_AN_OBJECT_MSG = 'a system must be a JSON object'
+NOT_A_NUMBER_MSG = 'not a number: {!r}'
+
+
+# every reader yields (id, augmented rows) pairs, one system at a time. A
+# system that can not be read is yielded as (id, exception) instead and
+# becomes an error line, the rest of the stream is still solved.
+
+def _rectangular(rows):
+    if any(len(row) != len(rows[0]) for row in rows):
+        raise ValueError(RAGGED_MSG)
+    return rows
+
+
+def read_jsonl(stream, backend=DECIMAL):
+    parse_float = float if backend == FLOAT else Decimal
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        system_id = line_number
+        try:
+            record = json.loads(line, parse_float=parse_float)
+            if not isinstance(record, dict):
+                raise ValueError(NOT_AN_OBJECT_MSG)
+            system_id = record.get('id', line_number)
+            if len(record['coefficients']) != len(record['constants']):
+                raise ValueError(CONSTANTS_MSG)
+            rows = _rectangular([list(a) + [b] for a, b in zip(record['coefficients'], record['constants'])])
+        except KeyError as e:
+            yield system_id, ValueError(MISSING_FIELD_MSG.format(e.args[0]))
+        except (ValueError, TypeError) as e:
+            yield system_id, e
+        else:
+            yield system_id, rows
+
+
+def read_csv(stream, backend=DECIMAL):
+    parse = float if backend == FLOAT else Decimal
+
+    def number(x):
+        try:
+            return parse(x)
+        except (ValueError, ArithmeticError):
+            raise ValueError(NOT_A_NUMBER_MSG.format(x))
+
+    reader = (row for row in csv.reader(stream) if row)
+    for system_id, equations in groupby(reader, key=lambda row: row[0]):
+        try:
+            rows = _rectangular([[number(x) for x in row[1:]] for row in equations])
+        except ValueError as e:
+            yield system_id, e
+        else:
+            yield system_id, rows
+
+
+def read_binary(stream, backend=FLOAT):
+    index = 0
+    while True:
+        header = stream.read(RECORD_HEADER.size)
+        if not header:
+            return
+        # nothing after a truncated record can be read, so it ends the stream
+        if len(header) < RECORD_HEADER.size:
+            yield index, ValueError('truncated record header')
+            return
+        num_equations, num_variables = RECORD_HEADER.unpack(header)
+        size = num_equations * (num_variables + 1) * 8
+        data = stream.read(size)
+        if len(data) < size:
+            yield index, ValueError('truncated record')
+            return
+        rows = np.frombuffer(data, dtype='<f8').reshape(num_equations, num_variables + 1)
+        yield index, rows
+        index += 1
+
+
+def read_lalg(stream, backend=FLOAT):
+    systems = dataset.load_systems(stream.name)
+    for index in range(len(systems)):
+        rows = systems[index]
+        yield index, rows if backend == FLOAT else rows.tolist()
+
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv, 'binary': read_binary, 'lalg': read_lalg}
+
+
+# a solution coordinate for JSON: floats as numbers, Decimals and
+# Fractions as exact strings
+def json_number(x):
+    if isinstance(x, (float, np.floating)):
+        return float(x)
+    return str(x)
+
+
+# solve one augmented matrix, returning the JSON-ready result
+def solve_rows(system_id, rows, backend=DECIMAL):
+    if backend == ADAPTIVE:
+        return _solve_adaptive(system_id, rows)
+    try:
+        if backend == EXACT:
+            solution = bareiss.exact_solution(rows)
+        else:
+            solution = AugmentedMatrix(rows, backend).solve()
+            solution = [float(x) for x in solution] if backend == FLOAT else list(solution)
+
+    except Exception as e:
+        if str(e) in STATUS_BY_MSG:
+            return {'id': system_id, 'status': STATUS_BY_MSG[str(e)]}
+        return {'id': system_id, 'error': str(e)}
+
+    return {'id': system_id, 'status': 'unique', 'solution': [json_number(x) for x in solution]}
+
+
+# adaptive results also say which arithmetic was used and the condition estimate
+def _solve_adaptive(system_id, rows):
+    try:
+        result = adaptive.solve_adaptive(rows)
+    except Exception as e:
+        return {'id': system_id, 'error': str(e)}
+
+    record = {'id': system_id}
+    if isinstance(result.solution, str):
+        record['status'] = STATUS_BY_MSG[result.solution]
+    else:
+        record['status'] = 'unique'
+        record['solution'] = [json_number(x) for x in result.solution]
+    record.update(result.as_dict())
+    return record
+
+
+# read, solve and write one system at a time; returns the number of systems
+def solve_stream(source, out, fmt='jsonl', backend=DECIMAL):
+    count = 0
+    for system_id, rows in READERS[fmt](source, backend):
+        if isinstance(rows, Exception):
+            result = {'id': system_id, 'error': str(rows)}
+        else:
+            result = solve_rows(system_id, rows, backend)
+        out.write(json.dumps(result) + '\n')
+        count += 1
+    return count
+
+
+def _guess_format(path):
+    for fmt, suffixes in (('csv', ('.csv',)), ('binary', ('.bin', '.dat')), ('lalg', (dataset.SUFFIX,))):
+        if path.endswith(suffixes):
+            return fmt
+    return 'jsonl'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve a stream of linear systems.')
+    parser.add_argument('input', nargs='?', default='-', help='input file, - for stdin (default)')
+    parser.add_argument('-o', '--output', default='-', help='output file, - for stdout (default)')
+    parser.add_argument('-f', '--format', choices=FORMATS,
+                        help='input format (default: from the file name, else jsonl)')
+    parser.add_argument('-b', '--backend', choices=(DECIMAL, FLOAT, EXACT, ADAPTIVE), default=DECIMAL,
+                        help='arithmetic used for elimination (default: decimal); adaptive picks '
+                             'float, Decimal or exact per system from its condition number')
+    args = parser.parse_args(argv)
+
+    fmt = args.format or _guess_format(args.input)
+    if args.input == '-':
+        source = sys.stdin.buffer if fmt in ('binary', 'lalg') else sys.stdin
+    else:
+        source = open(args.input, 'rb' if fmt in ('binary', 'lalg') else 'r', newline='' if fmt == 'csv' else None)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+
+    try:
+        solve_stream(source, out, fmt, args.backend)
+    finally:
+        if source not in (sys.stdin, sys.stdin.buffer):
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,17 @@
 from decimal import Decimal, getcontext
 from copy import deepcopy
-from vector import Vector
+
+import numpy as np
+
+import vector
+from vector import Vector, FLOAT
 from plane import Plane
+from hyperplane import Hyperplane, MyDecimal
+from lu import LUFactorization
+import bareiss
+import iterative
+from qr import QRFactorization
+from instrument import timed
 
 getcontext().prec = 30
 
@@ -12,7 +22,7 @@ class LinearSystem(object):
     NO_SOLUTIONS_MSG = 'No solutions'
     INF_SOLUTIONS_MSG = 'Infinitely many solutions'
 
-    def __init__(self, planes):
+    def __init__(self, planes, backend=None):
         try:
             d = planes[0].dimension
             for p in planes:
@@ -20,11 +30,73 @@ class LinearSystem(object):
 
             self.planes = planes
             self.dimension = d
+            self.backend = backend or vector.default_backend
 
         except AssertionError:
             raise Exception(self.ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG)
 
 
+    # the whole system as one dense [A | b] matrix, ready for elimination
+    def augmented_matrix(self):
+        return AugmentedMatrix.from_planes(self.planes, self.backend)
+
+
+    # echelon form; elimination runs on the matrix, planes are only built at the end
+    def compute_triangular_form(self):
+        m = self.augmented_matrix()
+        m.compute_triangular_form()
+        return LinearSystem(m.to_planes(type(self.planes[0])), self.backend)
+
+
+    def compute_rref(self):
+        m = self.augmented_matrix()
+        m.compute_rref()
+        return LinearSystem(m.to_planes(type(self.planes[0])), self.backend)
+
+
+    # factorize the coefficients once (LU with partial pivoting); the result
+    # solves any number of constant vectors without redoing the elimination
+    # block and threads tune the blocked float factorization of large systems
+    def factorize(self, block=None, threads=None):
+        return LUFactorization(self.augmented_matrix().coefficients(), self.backend, block, threads)
+
+
+    # x minimizing ||A x - b|| through Householder QR, for overdetermined and
+    # inconsistent systems; a float Vector, or INF_SOLUTIONS_MSG when the
+    # columns are dependent (or too few equations) and the minimizer is not unique
+    def compute_least_squares_solution(self):
+        m = AugmentedMatrix.from_planes(self.planes, FLOAT)
+        try:
+            return QRFactorization(m.coefficients()).solve(m.constants())
+
+        except Exception as e:
+            if str(e) in (QRFactorization.RANK_DEFICIENT_MSG, QRFactorization.TOO_FEW_EQUATIONS_MSG):
+                return self.INF_SOLUTIONS_MSG
+            else:
+                raise e
+
+
+    # approximate solution by Jacobi, Gauss-Seidel or conjugate gradient
+    # ('jacobi', 'gauss_seidel', 'cg'), run in float arithmetic; options are
+    # tol, max_iter, x0 (a warm start) and the method's own settings.
+    # Returns an IterativeResult with the convergence statistics.
+    def solve_iterative(self, method='cg', **options):
+        return iterative.METHODS[method](self, **options)
+
+
+    # the unique solution as a Vector, or a message when there is none / infinitely many
+    def compute_solution(self):
+        try:
+            return self.augmented_matrix().solve()
+
+        except Exception as e:
+            if str(e) == self.NO_SOLUTIONS_MSG or str(e) == self.INF_SOLUTIONS_MSG:
+                return str(e)
+            else:
+                raise e
+
+
+    @timed('swap_rows')
     def swap_rows(self, row1, row2):
         self[row1], self[row2] = self[row2], self[row1]
         ''' 
@@ -35,27 +107,45 @@ class LinearSystem(object):
         
 
 
+    # exact mode: fraction-free Bareiss elimination on integers, giving the
+    # solution as a tuple of Fractions (or a message), with no near-zero test
+    def compute_exact_solution(self):
+        rows = [list(p.normal_vector) + [p.constant_term] for p in self.planes]
+        try:
+            return bareiss.exact_solution(rows)
+
+        except Exception as e:
+            if str(e) == self.NO_SOLUTIONS_MSG or str(e) == self.INF_SOLUTIONS_MSG:
+                return str(e)
+            else:
+                raise e
+
+
+    def exact_rank(self):
+        return bareiss.exact_rank([list(p.normal_vector) + [p.constant_term] for p in self.planes])
+
+
+    # the row is replaced by a new plane (of the same class), so a plane the
+    # caller or another system still holds is left unchanged
+    @timed('multiply_coefficient_and_row')
     def multiply_coefficient_and_row(self, coefficient, row):
-        n = self[row].normal_vector
-        new_normal_vector =[]
-        for item in n:
-            new_normal_vector.append(item * coefficient)
-      
-        new_constant_term = self[row].constant_term * coefficient
-        self[row] = Plane(new_normal_vector, new_constant_term)
+        p = self[row]
+        coefficient = Decimal(coefficient)
+        self[row] = p.__class__(normal_vector=p.normal_vector.scalar(coefficient),
+                                constant_term=p.constant_term * coefficient)
                       
 
+    # like multiply_coefficient_and_row, the row gets a new plane
+    @timed('add_multiple_times_row_to_row')
     def add_multiple_times_row_to_row(self, coefficient, row_to_add, row_to_be_added_to):
-        tempVector = [x * coefficient for x in self[row_to_add].normal_vector]
-        tempPlane = Plane( tempVector , self[row_to_add].constant_term * coefficient)
-        
-        row_to_add_list = tempPlane.normal_vector
-        row_to_be_added_to_list = self[row_to_be_added_to].normal_vector
-        new_vector = [x + y for x, y in zip(row_to_add_list, row_to_be_added_to_list)]
-        self[row_to_be_added_to].normal_vector = new_vector
-        
-        new_constant_term = self[row_to_be_added_to].constant_term + tempPlane.constant_term
-        self[row_to_be_added_to].constant_term = new_constant_term
+        p = self[row_to_add]
+        q = self[row_to_be_added_to]
+        coefficient = Decimal(coefficient)
+        normal_vector = Vector([Decimal(y) + Decimal(x) * coefficient
+                                for x, y in zip(p.normal_vector, q.normal_vector)],
+                               q.normal_vector.backend)
+        self[row_to_be_added_to] = q.__class__(normal_vector=normal_vector,
+                                               constant_term=q.constant_term + p.constant_term * coefficient)
         
                    
 
@@ -102,74 +192,228 @@ class LinearSystem(object):
         return ret
 
 
-class MyDecimal(Decimal):
-    def is_near_zero(self, eps=1e-10):
-        return abs(self) < eps
+# Dense augmented coefficient matrix [A | b] for elimination. Every row
+# operation mutates the one array in place; Decimal entries live in an object
+# array, the float backend uses float64.
+class AugmentedMatrix(object):
 
+    NEAR_ZERO_EPS = 1e-10
 
-'''
-# code for playing 
-p0 = Plane([1, 1, 1], 1)
-p1 = Plane([0, 1, 0], 2)
-p2 = Plane([1, 1, -1], 3)
-p3 = Plane([1, 0, -2], 2)
+    def __init__(self, data, backend=None):
+        self.backend = backend or vector.default_backend
+        if self.backend == FLOAT:
+            self.data = np.array(data, dtype=np.float64)
+        else:
+            self.data = np.array([[Decimal(x) for x in row] for row in data], dtype=object)
+            if self.data.ndim != 2:
+                self.data = self.data.reshape(len(data), -1)
+        self.num_equations, num_columns = self.data.shape
+        self.dimension = num_columns - 1
 
-s = LinearSystem([p0,p1,p2,p3])
 
+    @classmethod
+    def from_planes(cls, planes, backend=None):
+        rows = [list(p.normal_vector) + [p.constant_term] for p in planes]
+        return cls(rows, backend)
 
-print (s.indices_of_first_nonzero_terms_in_each_row())
-print ('{},{},{},{}'.format(s[0],s[1],s[2],s[3]))
-print (len(s))
-print (s)
-'''
 
-# Test code
-p1 = Plane([1,1,1], constant_term=1)
-p2 = Plane([0,1,1], constant_term=2)
-s = LinearSystem([p1,p2])
-t = s.compute_triangular_form()
-if not (t[0] == p1 and
-        t[1] == p2):
-    print ('test case 1 failed')
+    # materialize the rows as Plane (or Line / Hyperplane) objects, only done
+    # on request; their basepoints are computed lazily
+    @timed('to_planes')
+    def to_planes(self, plane_class=Hyperplane):
+        return [plane_class(normal_vector=Vector(row[:-1], self.backend), constant_term=row[-1])
+                for row in self.data]
 
-p1 = Plane([1,1,1], constant_term=1)
-p2 = Plane([1,1,1], constant_term=2)
-s = LinearSystem([p1,p2])
-t = s.compute_triangular_form()
-if not (t[0] == p1 and
-        t[1] == Plane(constant_term=1)):
-    print ('test case 2 failed')
 
-p1 = Plane([1,1,1], constant_term=1)
-p2 = Plane([0,1,0], constant_term=2)
-p3 = Plane([1,1,-1], constant_term=3)
-p4 = Plane([1,0,-2], constant_term=2)
-s = LinearSystem([p1,p2,p3,p4])
-t = s.compute_triangular_form()
-if not (t[0] == p1 and
-        t[1] == p2 and
-        t[2] == Plane(normal_vector=Vector([0,0,-2]), constant_term=2) and
-        t[3] == Plane()):
-    print ('test case 3 failed')
+    def coefficients(self):
+        return self.data[:, :-1]
+
+
+    def constants(self):
+        return self.data[:, -1]
+
+
+    def is_near_zero(self, x):
+        return abs(x) < self.NEAR_ZERO_EPS
+
+
+    @timed('swap_rows')
+    def swap_rows(self, row1, row2):
+        self.data[[row1, row2]] = self.data[[row2, row1]]
 
-p1 = Plane([0,1,1], constant_term=1)
-p2 = Plane([1,-1,1], constant_term=2)
-p3 = Plane([1,2,-5], constant_term=3)
-s = LinearSystem([p1,p2,p3])
-t = s.compute_triangular_form()
-if not (t[0] == Plane([1,-1,1], constant_term=2) and
-        t[1] == Plane([0,1,1], constant_term=1) and
-        t[2] == Plane([0,0,-9], constant_term=-2)):
-    print ('test case 4 failed')
 
+    @timed('multiply_coefficient_and_row')
+    def multiply_coefficient_and_row(self, coefficient, row):
+        self.data[row] *= coefficient
 
 
+    @timed('add_multiple_times_row_to_row')
+    def add_multiple_times_row_to_row(self, coefficient, row_to_add, row_to_be_added_to):
+        self.data[row_to_be_added_to] += coefficient * self.data[row_to_add]
+
+
+    # column index of the first nonzero coefficient of a row, -1 for a zero row
+    def first_nonzero_index(self, row):
+        for k in range(self.dimension):
+            if not self.is_near_zero(self.data[row, k]):
+                return k
+        return -1
+
+
+    # row (at or below start) to pivot on in column col, None if all are zero.
+    # Decimal keeps the first usable row, float takes the largest magnitude
+    # (partial pivoting) for stability.
+    @timed('pivot_selection')
+    def find_pivot_row(self, col, start):
+        column = self.data[start:, col]
+        if len(column) == 0:
+            return None
+        if self.backend == FLOAT:
+            k = int(np.argmax(np.abs(column)))
+            return None if self.is_near_zero(column[k]) else start + k
+        for k, x in enumerate(column):
+            if not self.is_near_zero(x):
+                return start + k
+        return None
+
+
+    def compute_triangular_form(self):
+        a = self.data
+        row = 0
+        for col in range(self.dimension):
+            if row >= self.num_equations:
+                break
+            pivot_row = self.find_pivot_row(col, row)
+            if pivot_row is None:
+                continue
+            if pivot_row != row:
+                self.swap_rows(row, pivot_row)
+
+            self.clear_below(row, col)
+            row += 1
+        return self
+
+
+    # clear the column below a pivot with a single rank-one update, i.e. one
+    # add_multiple_times_row_to_row for every row underneath at once
+    @timed('clear_below')
+    def clear_below(self, row, col):
+        a = self.data
+        factors = a[row+1:, col] / a[row, col]
+        a[row+1:, col:] -= np.outer(factors, a[row, col:])
+        a[row+1:, col] = 0
+
+
+    @timed('clear_above')
+    def clear_above(self, row, col):
+        a = self.data
+        a[:row] -= np.outer(a[:row, col], a[row])
+        a[:row, col] = 0
+
+
+    def compute_rref(self):
+        self.compute_triangular_form()
+        a = self.data
+        for row in range(self.num_equations - 1, -1, -1):
+            col = self.first_nonzero_index(row)
+            if col < 0:
+                continue
+            self.multiply_coefficient_and_row(1 / a[row, col], row)
+            a[row, col] = 1
+            self.clear_above(row, col)
+        return self
+
+
+    # reduces the matrix and returns the unique solution as a Vector
+    def solve(self):
+        self.compute_rref()
+        pivots = [self.first_nonzero_index(row) for row in range(self.num_equations)]
+
+        for row, col in enumerate(pivots):
+            if col < 0 and not self.is_near_zero(self.data[row, -1]):
+                raise Exception(LinearSystem.NO_SOLUTIONS_MSG)
+
+        if sum(1 for col in pivots if col >= 0) < self.dimension:
+            raise Exception(LinearSystem.INF_SOLUTIONS_MSG)
+
+        solution = [0] * self.dimension
+        for row, col in enumerate(pivots):
+            if col >= 0:
+                solution[col] = self.data[row, -1]
+        return Vector(solution, self.backend)
 
 
+'''
+# code for playing 
+p0 = Plane([1, 1, 1], 1)
+p1 = Plane([0, 1, 0], 2)
+p2 = Plane([1, 1, -1], 3)
+p3 = Plane([1, 0, -2], 2)
 
+s = LinearSystem([p0,p1,p2,p3])
 
 
+print (s.indices_of_first_nonzero_terms_in_each_row())
+print ('{},{},{},{}'.format(s[0],s[1],s[2],s[3]))
+print (len(s))
+print (s)
+'''
 
+if __name__ == '__main__':
+    # Test code
+    p1 = Plane([1,1,1], constant_term=1)
+    p2 = Plane([0,1,1], constant_term=2)
+    s = LinearSystem([p1,p2])
+    t = s.compute_triangular_form()
+    if not (t[0] == p1 and
+            t[1] == p2):
+        print ('test case 1 failed')
+
+    p1 = Plane([1,1,1], constant_term=1)
+    p2 = Plane([1,1,1], constant_term=2)
+    s = LinearSystem([p1,p2])
+    t = s.compute_triangular_form()
+    if not (t[0] == p1 and
+            t[1] == Plane(constant_term=1)):
+        print ('test case 2 failed')
+
+    p1 = Plane([1,1,1], constant_term=1)
+    p2 = Plane([0,1,0], constant_term=2)
+    p3 = Plane([1,1,-1], constant_term=3)
+    p4 = Plane([1,0,-2], constant_term=2)
+    s = LinearSystem([p1,p2,p3,p4])
+    t = s.compute_triangular_form()
+    if not (t[0] == p1 and
+            t[1] == p2 and
+            t[2] == Plane(normal_vector=Vector([0,0,-2]), constant_term=2) and
+            t[3] == Plane()):
+        print ('test case 3 failed')
+
+    p1 = Plane([0,1,1], constant_term=1)
+    p2 = Plane([1,-1,1], constant_term=2)
+    p3 = Plane([1,2,-5], constant_term=3)
+    s = LinearSystem([p1,p2,p3])
+    t = s.compute_triangular_form()
+    if not (t[0] == Plane([1,-1,1], constant_term=2) and
+            t[1] == Plane([0,1,1], constant_term=1) and
+            t[2] == Plane([0,0,-9], constant_term=-2)):
+        print ('test case 4 failed')
+
+    # scaling a row must not change the plane the caller passed in
+    p1 = Plane([1,2,3], constant_term=4)
+    s = LinearSystem([p1, Plane([0,1,1], constant_term=2)])
+    s.multiply_coefficient_and_row(2,0)
+    if not (p1 == Plane([1,2,3], constant_term=4) and
+            s[0] == Plane([2,4,6], constant_term=8)):
+        print ('test case 5 failed')
+
+    # neither must adding a multiple of another row
+    p2 = Plane([1,1,1], constant_term=2)
+    s = LinearSystem([Plane([1,2,3], constant_term=4), p2])
+    s.add_multiple_times_row_to_row(1,0,1)
+    if not (p2 == Plane([1,1,1], constant_term=2) and
+            s[1] == Plane([2,3,4], constant_term=6)):
+        print ('test case 6 failed')
 
 
 '''
@@ -0,0 +1,177 @@
+from decimal import Decimal, getcontext
+
+import numpy as np
+
+import vector
+from vector import Vector, FLOAT
+import blocked
+
+getcontext().prec = 30
+
+
+# LU factorization with partial pivoting, P A = L U, computed once and reused
+# for any number of right-hand sides. L (unit lower) and U share one array
+# the way LAPACK stores them; perm[i] is the original row now at row i.
+class LUFactorization(object):
+
+    NEAR_ZERO_EPS = 1e-10
+    SINGULAR_MATRIX_MSG = 'The coefficient matrix is singular'
+    MATRIX_MUST_BE_SQUARE_MSG = 'Only square coefficient matrices can be solved'
+    RHS_SIZE_MSG = 'Each right-hand side needs one value per equation'
+    BLOCKED_MIN_SIZE = 128
+
+    # Square float matrices of at least BLOCKED_MIN_SIZE rows (or any size
+    # when block is given) go through the blocked, multithreaded
+    # factorization of blocked.py; threads defaults to one per core.
+    def __init__(self, coefficients, backend=None, block=None, threads=None):
+        self.backend = backend or vector.default_backend
+        if self.backend == FLOAT:
+            a = np.array(coefficients, dtype=np.float64)
+        else:
+            a = np.array([[Decimal(x) for x in row] for row in coefficients], dtype=object)
+        self.num_equations, self.dimension = a.shape
+        self.perm = np.arange(self.num_equations)
+        self.sign = 1
+        self.lu = a
+        if (self.backend == FLOAT and self.num_equations == self.dimension
+                and (block or self.dimension >= self.BLOCKED_MIN_SIZE)):
+            self.perm, self.sign = blocked.lu_factor(a, block or blocked.BLOCK, threads)
+        else:
+            self._factorize()
+
+
+    # an LUFactorization around factors computed before (read back from a
+    # cache), without factorizing again
+    @classmethod
+    def _from_factors(cls, lu, perm, sign, backend):
+        factorization = object.__new__(cls)
+        factorization.backend = backend
+        factorization.lu = lu
+        factorization.num_equations, factorization.dimension = lu.shape
+        factorization.perm = perm
+        factorization.sign = sign
+        return factorization
+
+
+    def is_near_zero(self, x):
+        return abs(x) < self.NEAR_ZERO_EPS
+
+
+    def _factorize(self):
+        a = self.lu
+        for k in range(min(self.num_equations, self.dimension)):
+            p = k + int(np.argmax(np.abs(a[k:, k])))
+            if self.is_near_zero(a[p, k]):
+                # nothing to eliminate in this column, U gets a zero pivot
+                a[k:, k] = 0
+                continue
+            if p != k:
+                a[[k, p]] = a[[p, k]]
+                self.perm[[k, p]] = self.perm[[p, k]]
+                self.sign = -self.sign
+
+            a[k+1:, k] /= a[k, k]
+            a[k+1:, k+1:] -= np.outer(a[k+1:, k], a[k, k+1:])
+
+
+    def lower(self):
+        l = np.tril(self.lu[:, :min(self.num_equations, self.dimension)], -1)
+        for i in range(l.shape[1]):
+            l[i, i] = 1
+        return l
+
+
+    def upper(self):
+        return np.triu(self.lu[:min(self.num_equations, self.dimension)])
+
+
+    def diagonal(self):
+        return np.diagonal(self.lu).copy()
+
+
+    # det(A) = sign(P) * prod(diag(U)), free once the factors exist
+    def determinant(self):
+        if self.num_equations != self.dimension:
+            raise Exception(self.MATRIX_MUST_BE_SQUARE_MSG)
+        det = self.sign
+        for x in self.diagonal():
+            det = det * x
+        return det
+
+
+    # number of usable pivots in U; exact for nonsingular matrices, an
+    # estimate for rank-deficient ones (partial pivoting is not rank revealing)
+    def rank(self):
+        return sum(1 for x in self.diagonal() if not self.is_near_zero(x))
+
+
+    def is_singular(self):
+        return self.num_equations != self.dimension or self.rank() < self.dimension
+
+
+    # b is one right-hand side (a Vector or sequence, gives a Vector back) or
+    # a batch of k right-hand sides with shape (k, n) (gives a (k, n) array)
+    def solve(self, b):
+        if self.is_singular():
+            raise Exception(self.SINGULAR_MATRIX_MSG)
+
+        single = isinstance(b, Vector) or np.ndim(b) == 1
+        if self.backend == FLOAT:
+            rhs = np.array(b, dtype=np.float64, ndmin=2)
+        else:
+            rhs = np.array([[Decimal(x) for x in row] for row in np.array(b, dtype=object, ndmin=2)],
+                           dtype=object)
+        if rhs.shape[1] != self.num_equations:
+            raise ValueError(self.RHS_SIZE_MSG)
+
+        # columns are right-hand sides so every step below is one row update
+        y = rhs.T[self.perm]
+        n = self.dimension
+        a = self.lu
+        for i in range(1, n):
+            y[i] -= a[i, :i] @ y[:i]
+        for i in range(n - 1, -1, -1):
+            y[i] = (y[i] - a[i, i+1:] @ y[i+1:]) / a[i, i]
+
+        if single:
+            return Vector(y[:, 0], self.backend)
+        return y.T.copy()
+
+
+    # x with A^T x = b, for the same forms of b as solve; P A = L U gives
+    # U^T L^T (P x) = b, two triangular solves and a permutation
+    def solve_transpose(self, b):
+        if self.is_singular():
+            raise Exception(self.SINGULAR_MATRIX_MSG)
+
+        single = isinstance(b, Vector) or np.ndim(b) == 1
+        if self.backend == FLOAT:
+            rhs = np.array(b, dtype=np.float64, ndmin=2)
+        else:
+            rhs = np.array([[Decimal(x) for x in row] for row in np.array(b, dtype=object, ndmin=2)],
+                           dtype=object)
+        if rhs.shape[1] != self.dimension:
+            raise ValueError(self.RHS_SIZE_MSG)
+
+        y = rhs.T.copy()
+        n = self.dimension
+        a = self.lu
+        for i in range(n):
+            y[i] = (y[i] - a[:i, i] @ y[:i]) / a[i, i]
+        for i in range(n - 2, -1, -1):
+            y[i] -= a[i+1:, i] @ y[i+1:]
+        x = y.copy()
+        x[self.perm] = y
+
+        if single:
+            return Vector(x[:, 0], self.backend)
+        return x.T.copy()
+
+
+if __name__ == '__main__':
+    # test code
+    lu = LUFactorization([[1, 2, 3], [2, -1, 1], [0, 1, -1]])
+    print(lu.solve([6, 2, 0]))
+    print(lu.solve([[6, 2, 0], [1, 2, 3]]))
+    print(lu.determinant(), lu.rank())
+    print(lu.solve_transpose([3, 1, 3]))
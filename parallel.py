@@ -0,0 +1,234 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from decimal import Decimal
+from fractions import Fraction
+from itertools import islice
+
+import numpy as np
+
+import bareiss
+from bareiss import EXACT
+import dataset
+from vector import Vector, DECIMAL, FLOAT
+from linsys import LinearSystem, AugmentedMatrix
+
+
+# status codes sent back from the workers
+UNIQUE, NO_SOLUTIONS, INF_SOLUTIONS = 0, 1, 2
+MESSAGES = {NO_SOLUTIONS: LinearSystem.NO_SOLUTIONS_MSG, INF_SOLUTIONS: LinearSystem.INF_SOLUTIONS_MSG}
+CODES = {msg: code for code, msg in MESSAGES.items()}
+
+# well-conditioned square float systems skip elimination and go through one
+# stacked numpy solve; the rest are classified by the elimination engine
+MAX_CONDITION = 1e12
+
+
+# augmented rows of a LinearSystem (or anything array-like that already is [A | b])
+def _rows_of(system, backend):
+    if isinstance(system, LinearSystem):
+        backend = FLOAT if backend == FLOAT else DECIMAL
+        return AugmentedMatrix.from_planes(system.planes, backend).data.tolist()
+    return system
+
+
+# A chunk travels to a worker as the shapes of its systems plus one flat
+# buffer: float64 bytes for the float backend, whitespace separated number
+# text for decimal/exact. No Plane, Vector or Decimal objects are pickled.
+def _pack(chunk, backend):
+    shapes = []
+    if backend == FLOAT:
+        arrays = [np.asarray(_rows_of(s, backend), dtype=np.float64) for s in chunk]
+        shapes = [a.shape for a in arrays]
+        return shapes, b''.join(a.tobytes() for a in arrays)
+    words = []
+    for s in chunk:
+        rows = _rows_of(s, backend)
+        shapes.append((len(rows), len(rows[0])))
+        words.extend(str(x) for row in rows for x in row)
+    return shapes, ' '.join(words)
+
+
+def _unpack(shapes, payload, backend):
+    systems = []
+    if backend == FLOAT:
+        flat = np.frombuffer(payload, dtype=np.float64)
+        offset = 0
+        for m, n in shapes:
+            systems.append(flat[offset:offset + m * n].reshape(m, n))
+            offset += m * n
+        return systems
+    words = payload.split()
+    offset = 0
+    for m, n in shapes:
+        values = words[offset:offset + m * n]
+        systems.append([values[i * n:(i + 1) * n] for i in range(m)])
+        offset += m * n
+    return systems
+
+
+def _solve_one(rows, backend):
+    try:
+        if backend == EXACT:
+            return UNIQUE, bareiss.exact_solution(rows)
+        return UNIQUE, AugmentedMatrix(rows, backend).solve()
+
+    except Exception as e:
+        if str(e) in CODES:
+            return CODES[str(e)], None
+        raise e
+
+
+# runs in the worker: solve every system of a chunk, return packed results
+def _solve_chunk(index, shapes, payload, backend):
+    return index, _solve_systems(shapes, _unpack(shapes, payload, backend), backend)
+
+
+# dataset files opened by this worker process, by path
+_mapped = {}
+
+
+# runs in the worker: solve systems start:stop of a dataset file, which the
+# worker maps itself, so no coefficients are sent between processes
+def _solve_mapped(index, path, start, stop, backend):
+    if path not in _mapped:
+        _mapped[path] = dataset.load_systems(path)
+    systems = _mapped[path][start:stop]
+    if backend != FLOAT:
+        systems = systems.tolist()
+    return index, _solve_systems([s.shape if backend == FLOAT else (len(s), len(s[0])) for s in systems],
+                                 systems, backend)
+
+
+def _solve_systems(shapes, systems, backend):
+    results = [None] * len(systems)
+
+    if backend == FLOAT:
+        # one batched LAPACK call per group of same-size square systems
+        groups = {}
+        for i, (m, n) in enumerate(shapes):
+            if m == n - 1:
+                groups.setdefault(m, []).append(i)
+        for size, members in groups.items():
+            stack = np.stack([systems[i] for i in members])
+            a, b = stack[:, :, :-1], stack[:, :, -1:]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                good = np.linalg.cond(a) < MAX_CONDITION
+            if good.any():
+                x = np.linalg.solve(a[good], b[good])[:, :, 0]
+                for i, solution in zip(np.asarray(members)[good], x):
+                    results[i] = (UNIQUE, solution.tobytes())
+
+    for i, rows in enumerate(systems):
+        if results[i] is None:
+            code, solution = _solve_one(rows, backend)
+            if solution is not None:
+                if backend == FLOAT:
+                    solution = np.asarray(solution.coordinates, dtype=np.float64).tobytes()
+                else:
+                    solution = ' '.join(str(x) for x in solution)
+            results[i] = (code, solution)
+    return results
+
+
+def _result(code, solution, backend):
+    if code != UNIQUE:
+        return MESSAGES[code]
+    if backend == FLOAT:
+        return Vector(np.frombuffer(solution, dtype=np.float64), FLOAT)
+    if backend == EXACT:
+        return tuple(Fraction(x) for x in solution.split())
+    return Vector([Decimal(x) for x in solution.split()], DECIMAL)
+
+
+# solve a batch of systems in this process, with the same grouping into
+# stacked numpy solves the workers use; results as in solve_many
+def solve_batch(systems, backend=FLOAT):
+    if backend == FLOAT:
+        systems = [np.asarray(_rows_of(s, backend), dtype=np.float64) for s in systems]
+        shapes = [s.shape for s in systems]
+    else:
+        systems = [_rows_of(s, backend) for s in systems]
+        shapes = [(len(s), len(s[0])) for s in systems]
+    return [_result(code, solution, backend)
+            for code, solution in _solve_systems(shapes, systems, backend)]
+
+
+def _chunks(systems, chunksize):
+    it = iter(systems)
+    while True:
+        chunk = list(islice(it, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+# Solve many independent systems on a process pool.
+# systems: LinearSystem objects or augmented [A | b] row arrays
+# (a (k, m, n+1) array works too). Results are what compute_solution gives
+# (a Vector or a message; a tuple of Fractions for backend='exact').
+# ordered=True yields results in input order; ordered=False yields
+# (index, result) pairs as soon as their chunk is done. At most
+# max_pending chunks are in flight, so the input can be a lazy iterable of
+# any length.
+def solve_many(systems, processes=None, chunksize=256, ordered=True, backend=FLOAT,
+               max_pending=None):
+    jobs = ((_solve_chunk, (index,) + _pack(chunk, backend) + (backend,))
+            for index, chunk in enumerate(_chunks(systems, chunksize)))
+    return _run(jobs, processes, chunksize, ordered, backend, max_pending)
+
+
+# solve_many for the systems of a dataset file (see dataset.py); every
+# worker maps the file and reads its own chunks from the shared page cache
+def solve_dataset(path, processes=None, chunksize=256, ordered=True, backend=FLOAT,
+                  max_pending=None):
+    count = dataset.read_header(path)[2][0]
+    jobs = ((_solve_mapped, (index, path, start, min(start + chunksize, count), backend))
+            for index, start in enumerate(range(0, count, chunksize)))
+    return _run(jobs, processes, chunksize, ordered, backend, max_pending)
+
+
+def _run(jobs, processes, chunksize, ordered, backend, max_pending):
+    processes = processes or os.cpu_count() or 1
+    max_pending = max_pending or 2 * processes
+    pending = deque()
+
+    def collect(future):
+        index, results = future.result()
+        base = index * chunksize
+        for k, (code, solution) in enumerate(results):
+            result = _result(code, solution, backend)
+            yield result if ordered else (base + k, result)
+
+    # hand out finished chunks until at most `keep` are still in flight
+    def drain(keep):
+        while len(pending) > keep:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+            for future in done:
+                yield from collect(future)
+
+    with ProcessPoolExecutor(processes) as pool:
+        for fn, args in jobs:
+            pending.append(pool.submit(fn, *args))
+            yield from drain(max_pending - 1)
+        yield from drain(0)
+
+if __name__ == '__main__':
+    # test code
+    from plane import Plane
+    s1 = LinearSystem([Plane([1, 2, 3], 6), Plane([2, -1, 1], 2), Plane([0, 1, -1], 0)])
+    s2 = LinearSystem([Plane([1, 1, 1], 1), Plane([1, 1, 1], 2)])
+    s3 = LinearSystem([Plane([1, 1, 1], 1), Plane([0, 1, 1], 2)])
+    for result in solve_many([s1, s2, s3] * 3, processes=2, chunksize=2):
+        print(result)
+    print(list(solve_many([s1, s2], processes=2, backend=EXACT)))
+    print(sorted(solve_many([s1, s3], processes=2, ordered=False))[0][0])
+    import tempfile
+    path = tempfile.mktemp(suffix=dataset.SUFFIX)
+    dataset.save_systems(path, [s1, s1])
+    print(list(solve_dataset(path, processes=2)))
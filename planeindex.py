@@ -0,0 +1,226 @@
+import numpy as np
+
+from vector import Vector, FLOAT
+from vectorbatch import VectorBatch
+from hyperplane import Hyperplane
+from plane import Plane
+from linsys import AugmentedMatrix
+
+# point x plane distances worked out per step of nearest(); bounds the
+# temporary (points, planes) block to about 8 * QUERY_BLOCK bytes
+QUERY_BLOCK = 1 << 22
+# deleted rows are dropped from storage once they are more than this
+# fraction of it
+COMPACT_FRACTION = 0.5
+MIN_CAPACITY = 16
+
+
+# A set of planes (or hyperplanes of any one dimension) prepared for batched
+# distance queries. Every plane is stored normalized, unit normal and the
+# constant scaled to match, so the signed distance of a point x to plane i
+# is just  n_i . x - k_i  and a whole query is one matrix product.
+#
+# Planes get an integer id on insertion that stays valid until they are
+# deleted. Storage grows by doubling; deleted rows are masked out and, once
+# they make up more than COMPACT_FRACTION of it, squeezed out in one pass,
+# so memory and query cost follow the planes actually in the index. Rows
+# stay in id order, so an id is found by binary search.
+class PlaneIndex(object):
+
+    ZERO_NORMAL_MSG = 'A plane with a zero normal vector has no distance to a point'
+    DIMENSION_MISMATCH_MSG = 'Points and planes must have the same dimension'
+    NOT_ENOUGH_PLANES_MSG = 'Fewer planes in the index than neighbours asked for'
+    UNKNOWN_ID_MSG = 'No plane with this id in the index'
+
+    def __init__(self, planes=(), dimension=3, capacity=MIN_CAPACITY):
+        self.dimension = dimension
+        self._normals = np.zeros((capacity, dimension))
+        self._constants = np.zeros(capacity)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._used = 0
+        self._count = 0
+        self._next_id = 0
+        if len(planes):
+            self.insert(planes)
+
+    # [A | k] rows for Planes, a single Plane or an (N, d + 1) array
+    def _rows(self, planes):
+        if isinstance(planes, np.ndarray):
+            rows = np.array(planes, dtype=np.float64, ndmin=2)
+        else:
+            if hasattr(planes, 'normal_vector'):
+                planes = [planes]
+            rows = (AugmentedMatrix.from_planes(planes, FLOAT).data if len(planes)
+                    else np.zeros((0, self.dimension + 1)))
+        if rows.shape[1] != self.dimension + 1:
+            raise ValueError(self.DIMENSION_MISMATCH_MSG)
+        return rows
+
+    # points as an (M, d) array: one Vector, a VectorBatch or an array like
+    def _points(self, points):
+        if isinstance(points, VectorBatch):
+            points = points.data
+        elif isinstance(points, Vector):
+            points = np.asarray(points.coordinates, dtype=np.float64)
+        points = np.array(points, dtype=np.float64, ndmin=2)
+        if points.shape[1] != self.dimension:
+            raise ValueError(self.DIMENSION_MISMATCH_MSG)
+        return points
+
+    def _resize(self, capacity):
+        for name in ('_normals', '_constants', '_ids', '_alive'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self._used] = old[:self._used]
+            setattr(self, name, new)
+
+    def _grow(self, needed):
+        capacity = len(self._alive)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self._resize(capacity)
+
+    # drop the deleted rows, keeping the others in id order, and give back
+    # the storage that is no longer needed
+    def _compact(self):
+        keep = np.flatnonzero(self._alive[:self._used])
+        for name in ('_normals', '_constants', '_ids'):
+            array = getattr(self, name)
+            array[:len(keep)] = array[keep]
+        self._alive[:len(keep)] = True
+        self._alive[len(keep):] = False
+        self._used = len(keep)
+        capacity = max(MIN_CAPACITY, 2 * self._used)
+        if capacity < len(self._alive):
+            self._resize(capacity)
+
+    # storage rows of the given ids; KeyError for ids not in the index
+    def _slots(self, ids):
+        ids = np.atleast_1d(np.asarray(ids, dtype=np.int64))
+        if not len(ids):
+            return ids
+        if not self._used:
+            raise KeyError(self.UNKNOWN_ID_MSG)
+        slots = np.minimum(np.searchsorted(self._ids[:self._used], ids), self._used - 1)
+        if np.any(self._ids[slots] != ids) or not self._alive[slots].all():
+            raise KeyError(self.UNKNOWN_ID_MSG)
+        return slots
+
+    # add one plane or many; returns the array of their new ids
+    def insert(self, planes):
+        rows = self._rows(planes)
+        norms = np.linalg.norm(rows[:, :-1], axis=1)
+        if np.any(norms < 1e-10):
+            raise ValueError(self.ZERO_NORMAL_MSG)
+
+        slots = np.arange(self._used, self._used + len(rows))
+        ids = np.arange(self._next_id, self._next_id + len(rows))
+        self._grow(self._used + len(rows))
+        self._normals[slots] = rows[:, :-1] / norms[:, None]
+        self._constants[slots] = rows[:, -1] / norms
+        self._ids[slots] = ids
+        self._alive[slots] = True
+        self._used += len(rows)
+        self._count += len(rows)
+        self._next_id += len(rows)
+        return ids
+
+    # remove planes by id (an int or a sequence of ints)
+    def delete(self, ids):
+        slots = np.unique(self._slots(ids))
+        self._alive[slots] = False
+        self._count -= len(slots)
+        if self._used - self._count > COMPACT_FRACTION * self._used:
+            self._compact()
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, plane_id):
+        try:
+            self._slots(plane_id)
+        except KeyError:
+            return False
+        return True
+
+    # storage rows of the planes currently in the index, in id order
+    def _live(self):
+        return np.flatnonzero(self._alive[:self._used])
+
+    # ids of the planes currently in the index, ascending
+    def ids(self):
+        return self._ids[self._live()]
+
+    # the stored (normalized) plane with this id
+    def __getitem__(self, plane_id):
+        slot = self._slots(plane_id)[0]
+        plane_class = Plane if self.dimension == 3 else Hyperplane
+        return plane_class(normal_vector=list(self._normals[slot]),
+                           constant_term=self._constants[slot])
+
+    # signed distance of every point to every plane, shape (points, ids());
+    # positive on the side the normal points to
+    def signed_distance(self, points):
+        live = self._live()
+        return self._points(points) @ self._normals[live].T - self._constants[live]
+
+    def distance(self, points):
+        return np.abs(self.signed_distance(points))
+
+    # the k planes closest to each point. Returns (ids, distances), both of
+    # shape (points, k) and ordered nearest first; the distances are signed.
+    # An empty index (or k=0) gives (points, 0) arrays.
+    # Points are processed in blocks so memory stays at about QUERY_BLOCK
+    # distances however many points are asked about.
+    def nearest(self, points, k=1):
+        points = self._points(points)
+        if self._count == 0 or k == 0:
+            return np.zeros((len(points), 0), dtype=np.int64), np.zeros((len(points), 0))
+        if k > self._count:
+            raise ValueError(self.NOT_ENOUGH_PLANES_MSG)
+        live = self._live()
+        ids = self._ids[live]
+        normals, constants = self._normals[live], self._constants[live]
+
+        nearest_ids = np.empty((len(points), k), dtype=np.int64)
+        nearest_distances = np.empty((len(points), k))
+        step = max(1, QUERY_BLOCK // len(ids))
+        for start in range(0, len(points), step):
+            block = slice(start, start + step)
+            signed = points[block] @ normals.T - constants
+            absolute = np.abs(signed)
+            if k < len(ids):
+                candidates = np.argpartition(absolute, k - 1, axis=1)[:, :k]
+            else:
+                candidates = np.broadcast_to(np.arange(len(ids)), absolute.shape)
+            order = np.take_along_axis(absolute, candidates, 1).argsort(axis=1, kind='stable')
+            chosen = np.take_along_axis(candidates, order, 1)
+            nearest_ids[block] = ids[chosen]
+            nearest_distances[block] = np.take_along_axis(signed, chosen, 1)
+        return nearest_ids, nearest_distances
+
+
+if __name__ == '__main__':
+    # test code
+    index = PlaneIndex([Plane([1, 0, 0], 1), Plane([0, 2, 0], 4), Plane([0, 0, -1], 3)])
+    print(index.signed_distance(Vector([0, 0, 0])))
+    print(index.nearest([[0, 0, 0], [1, 2, -3]], k=2))
+    new = index.insert(Plane([1, 1, 1], 0))
+    index.delete(0)
+    print(len(index), index.ids(), index[new[0]])
+    print(index.nearest([[0.5, 0.5, -1]]))
+
+    # heavy churn keeps storage near the live planes, ids stay valid, and an
+    # emptied index answers with empty results
+    churn = PlaneIndex()
+    kept = churn.insert(np.tile([1.0, 0, 0, 0], (10, 1)))
+    for _ in range(1000):
+        churn.delete(churn.insert(Plane([0, 1, 0], 2)))
+    if not (len(churn._alive) <= 64 and list(churn.ids()) == list(kept) and kept[-1] in churn):
+        print('compaction test failed')
+    churn.delete(kept)
+    if churn.nearest([[0, 0, 0]], k=1)[0].shape != (1, 0):
+        print('empty index test failed')
@@ -0,0 +1,156 @@
+import numpy as np
+
+from vector import Vector, FLOAT
+from vectorbatch import VectorBatch, as_rows
+
+# vectors orthonormalized together; the work between blocks is matrix
+# products, so only the inside of a block runs vector by vector
+ORTHONORMALIZE_BLOCK = 64
+
+
+# Householder QR, A = Q R, of an m x n float matrix with m >= n. R sits in
+# the upper triangle of qr; the reflectors I - 2 v v^T are kept as unit
+# vectors, so Q is never formed unless asked for.
+class QRFactorization(object):
+
+    NEAR_ZERO_EPS = 1e-10
+    RANK_DEFICIENT_MSG = 'The columns of the coefficient matrix are linearly dependent'
+    TOO_FEW_EQUATIONS_MSG = 'Least squares needs at least as many equations as variables'
+    RHS_SIZE_MSG = 'Each right-hand side needs one value per equation'
+
+    def __init__(self, coefficients):
+        a = np.array(coefficients, dtype=np.float64)
+        self.num_equations, self.dimension = a.shape
+        if self.num_equations < self.dimension:
+            raise ValueError(self.TOO_FEW_EQUATIONS_MSG)
+        self.qr = a
+        self.reflectors = []
+        self._factorize()
+
+
+    def _factorize(self):
+        a = self.qr
+        for k in range(self.dimension):
+            x = a[k:, k]
+            norm = np.linalg.norm(x)
+            v = x.copy()
+            v[0] += norm if x[0] >= 0 else -norm
+            v_norm = np.linalg.norm(v)
+            if v_norm == 0:
+                # the column is already zero below the diagonal
+                self.reflectors.append(np.zeros_like(v))
+                continue
+            v /= v_norm
+            a[k:, k:] -= 2.0 * np.outer(v, v @ a[k:, k:])
+            a[k+1:, k] = 0
+            self.reflectors.append(v)
+
+
+    def upper(self):
+        return np.triu(self.qr[:self.dimension])
+
+
+    # Q^T y for the columns of y, one reflector at a time
+    def apply_qt(self, y):
+        y = np.array(y, dtype=np.float64)
+        for k, v in enumerate(self.reflectors):
+            y[k:] -= 2.0 * np.outer(v, v @ y[k:])
+        return y
+
+
+    # the first n columns of Q (m x n)
+    def orthogonal(self):
+        q = np.eye(self.num_equations, self.dimension)
+        for k in range(self.dimension - 1, -1, -1):
+            v = self.reflectors[k]
+            q[k:] -= 2.0 * np.outer(v, v @ q[k:])
+        return q
+
+
+    # |R_kk| relative to the largest one; without column pivoting this is an
+    # estimate for rank-deficient matrices, the same caveat as LU
+    def rank(self):
+        d = np.abs(np.diagonal(self.qr))
+        if not len(d) or d.max() == 0:
+            return 0
+        return int(np.sum(d > self.NEAR_ZERO_EPS * d.max()))
+
+
+    # x minimizing ||A x - b||. b is one right-hand side (gives a Vector) or
+    # a (k, m) batch (gives a (k, n) array).
+    def solve(self, b):
+        if self.rank() < self.dimension:
+            raise Exception(self.RANK_DEFICIENT_MSG)
+        single = isinstance(b, Vector) or np.ndim(b) == 1
+        rhs = np.array(b, dtype=np.float64, ndmin=2)
+        if rhs.shape[1] != self.num_equations:
+            raise ValueError(self.RHS_SIZE_MSG)
+
+        y = self.apply_qt(rhs.T)[:self.dimension]
+        r = self.qr
+        for i in range(self.dimension - 1, -1, -1):
+            y[i] = (y[i] - r[i, i+1:] @ y[i+1:]) / r[i, i]
+
+        if single:
+            return Vector(y[:, 0], FLOAT)
+        return y.T.copy()
+
+
+    # ||A x - b|| of the least-squares solution, read off Q^T b without x
+    def residual(self, b):
+        y = self.apply_qt(np.array(b, dtype=np.float64, ndmin=2).T)
+        residual = np.linalg.norm(y[self.dimension:], axis=0)
+        return float(residual[0]) if np.ndim(b) == 1 else residual
+
+
+# Orthonormal basis of the span of the vectors (a VectorBatch, a list of
+# Vectors or an (N, d) array), as a VectorBatch in input order. Modified
+# Gram-Schmidt inside blocks of ORTHONORMALIZE_BLOCK vectors, block
+# projections between them, and every vector projected twice ("twice is
+# enough") so the result stays orthogonal to working precision. Vectors
+# left with less than `tolerance` of their length are dependent and dropped.
+def orthonormalize(vectors, tolerance=1e-10):
+    v = np.array(as_rows(vectors), dtype=np.float64)
+    lengths = np.linalg.norm(v, axis=1)
+    basis = np.zeros((0, v.shape[1]))
+
+    for start in range(0, len(v), ORTHONORMALIZE_BLOCK):
+        block = v[start:start + ORTHONORMALIZE_BLOCK]
+        block -= (block @ basis.T) @ basis
+        kept = []
+        for i in range(len(block)):
+            w = block[i]
+            if kept:
+                q = np.array(kept)
+                w -= (q @ w) @ q
+            norm = np.linalg.norm(w)
+            if norm <= tolerance * lengths[start + i] or norm == 0:
+                continue
+            w /= norm
+            block[i+1:] -= np.outer(block[i+1:] @ w, w)
+            kept.append(w)
+        if kept:
+            kept = np.array(kept)
+            v[start + ORTHONORMALIZE_BLOCK:] -= (v[start + ORTHONORMALIZE_BLOCK:] @ kept.T) @ kept
+            basis = np.vstack([basis, kept])
+    return VectorBatch(basis)
+
+
+# projection of every vector onto the span of the basis vectors; the
+# generalization of VectorBatch.vector_projections to several base vectors
+def span_projections(vectors, basis, tolerance=1e-10):
+    q = orthonormalize(basis, tolerance).data
+    return VectorBatch((as_rows(vectors) @ q.T) @ q)
+
+
+def span_perp(vectors, basis, tolerance=1e-10):
+    return VectorBatch(as_rows(vectors) - span_projections(vectors, basis, tolerance).data)
+
+
+if __name__ == '__main__':
+    # test code
+    qr = QRFactorization([[1, 1, 1], [0, 1, 0], [1, 1, -1], [1, 0, -2]])
+    print(qr.solve([1, 2, 3, 2]), qr.residual([1, 2, 3, 2]))
+    basis = orthonormalize([Vector([3.039, 1.879]), Vector([0.825, 2.036]), Vector([1, 1])])
+    print(len(basis), basis.data @ basis.data.T)
+    print(span_projections([[1, 2, 3]], [[1, 0, 0], [1, 1, 0]]).data)
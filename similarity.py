@@ -0,0 +1,196 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from vectorbatch import VectorBatch, as_rows
+
+# rows and columns of the cosine matrix computed at once; one tile is
+# TILE * TILE float64 values (32 MB), whatever the number of vectors
+TILE = 2048
+# below this length a vector counts as zero and is left out of every pair
+ZERO_EPS = 1e-10
+# cosines are only accurate to about this much, so parallel candidates
+# found from the cosine are confirmed with the sine of the angle
+COSINE_SLACK = 1e-12
+
+
+# unit rows; zero vectors stay zero and are flagged
+def _normalized(vectors):
+    data = as_rows(vectors)
+    norms = np.sqrt(np.einsum('ij,ij->i', data, data))
+    zero = norms < ZERO_EPS
+    unit = np.zeros_like(data)
+    unit[~zero] = data[~zero] / norms[~zero, None]
+    return unit, zero
+
+
+# Scan the cosine matrix of rows start:stop of a against all of b tile by
+# tile. With same=True a and b are one set and only pairs i < j are kept.
+# mode is one of
+#     ('range', low, high, absolute)  pairs with low <= cos <= high (|cos| if absolute)
+#     ('parallel', tolerance)         pairs whose angle has sine <= tolerance
+#     ('topk', k)                     the k largest cosines of every row
+def _scan(a, b, a_zero, b_zero, same, start, stop, mode):
+    stop = min(stop, len(a))
+    block = a[start:stop]
+    if mode[0] == 'topk':
+        return _scan_topk(block, b, a_zero[start:stop], b_zero, same, start, mode[1])
+
+    found_i, found_j, found_cos = [], [], []
+    # row blocks start on tile boundaries, so for one set the tiles left of
+    # the diagonal hold only pairs j < i and are skipped
+    for col in range(start if same else 0, len(b), TILE):
+        tile = b[col:col + TILE]
+        cosine = block @ tile.T
+        value = np.abs(cosine) if mode[0] == 'parallel' or mode[3] else cosine
+        if mode[0] == 'parallel':
+            keep = value >= 1 - max(mode[1] ** 2 / 2, COSINE_SLACK)
+        else:
+            keep = (value >= mode[1]) & (value <= mode[2])
+        keep &= ~a_zero[start:stop, None] & ~b_zero[None, col:col + TILE]
+        if same:
+            keep &= np.arange(start, stop)[:, None] < np.arange(col, col + len(tile))[None, :]
+        i, j = np.nonzero(keep)
+        if mode[0] == 'parallel' and len(i):
+            # |a_i - (a_i . b_j) b_j| is the sine, accurate where 1 - |cos| is not
+            c = cosine[i, j]
+            sine = np.linalg.norm(block[i] - c[:, None] * tile[j], axis=1)
+            confirmed = sine <= mode[1]
+            i, j = i[confirmed], j[confirmed]
+        found_i.append(i + start)
+        found_j.append(j + col)
+        found_cos.append(cosine[i, j])
+    if not found_i:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0)
+    return np.concatenate(found_i), np.concatenate(found_j), np.concatenate(found_cos)
+
+
+# zero vectors have no neighbours and are no one's neighbour: their
+# cosines are -inf, reported as index -1
+def _scan_topk(block, b, block_zero, b_zero, same, start, k):
+    rows = np.arange(len(block))
+    best = np.full((len(block), k), -np.inf)
+    best_index = np.full((len(block), k), -1, dtype=np.int64)
+    for col in range(0, len(b), TILE):
+        cosine = block @ b[col:col + TILE].T
+        cosine[:, b_zero[col:col + TILE]] = -np.inf
+        cosine[block_zero] = -np.inf
+        if same:
+            own = rows + start - col
+            inside = (own >= 0) & (own < cosine.shape[1])
+            cosine[rows[inside], own[inside]] = -np.inf
+        values = np.concatenate([best, cosine], axis=1)
+        indices = np.concatenate([best_index, np.broadcast_to(np.arange(col, col + cosine.shape[1]),
+                                                               cosine.shape)], axis=1)
+        top = np.argpartition(-values, k - 1, axis=1)[:, :k]
+        best = np.take_along_axis(values, top, 1)
+        best_index = np.take_along_axis(indices, top, 1)
+    best_index[best == -np.inf] = -1
+    order = np.argsort(-best, axis=1, kind='stable')
+    return np.take_along_axis(best_index, order, 1), np.take_along_axis(best, order, 1)
+
+
+# arrays shared with the workers by name; attached arrays are cached per process
+_attached = {}
+
+
+def _share(array):
+    memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, array.dtype, memory.buf)[...] = array
+    return memory, (memory.name, array.shape, array.dtype.str)
+
+
+def _attach(spec):
+    name, shape, dtype = spec
+    if name not in _attached:
+        # workers report to the parent's resource tracker, which forgets
+        # the segment when the parent unlinks it
+        memory = shared_memory.SharedMemory(name=name)
+        _attached[name] = (memory, np.ndarray(shape, dtype, memory.buf))
+    return _attached[name][1]
+
+
+def _scan_shared(specs, same, start, stop, mode):
+    a, b, a_zero, b_zero = (_attach(spec) for spec in specs)
+    return _scan(a, b, a_zero, b_zero, same, start, stop, mode)
+
+
+# Run the scan over row blocks of TILE rows, on a pool of worker processes
+# that read the unit vectors from shared memory (processes=1 runs here).
+def _run(vectors, others, mode, processes):
+    a, a_zero = _normalized(vectors)
+    same = others is None
+    b, b_zero = (a, a_zero) if same else _normalized(others)
+    if a.shape[1] != b.shape[1]:
+        raise ValueError(VectorBatch.DIMENSIONS_MUST_MATCH_MSG)
+    starts = range(0, len(a), TILE)
+    processes = processes or os.cpu_count() or 1
+
+    if processes == 1 or len(starts) == 1:
+        return [_scan(a, b, a_zero, b_zero, same, s, s + TILE, mode) for s in starts]
+
+    shared = [_share(x) for x in (a, b, a_zero, b_zero)]
+    try:
+        specs = [spec for _, spec in shared]
+        with ProcessPoolExecutor(processes) as pool:
+            futures = [pool.submit(_scan_shared, specs, same, s, s + TILE, mode) for s in starts]
+            return [f.result() for f in futures]
+    finally:
+        for memory, _ in shared:
+            memory.close()
+            memory.unlink()
+
+
+def _pairs(parts):
+    i, j, cosine = (np.concatenate(x) for x in zip(*parts))
+    order = np.lexsort((j, i))
+    return i[order], j[order], cosine[order]
+
+
+# Every pair whose angle is at most `angle` (radians, or degrees), as
+# (i, j, cosines) sorted by (i, j). Without `others` the pairs are i < j
+# within `vectors`; with it, i indexes vectors and j indexes others.
+# undirected=True also counts angles near 180 degrees (|cos| is compared).
+def pairs_within_angle(vectors, angle, others=None, in_degrees=False, undirected=False,
+                       processes=None):
+    if in_degrees:
+        angle = math.radians(angle)
+    return _pairs(_run(vectors, others, ('range', math.cos(angle), np.inf, undirected), processes))
+
+
+def parallel_pairs(vectors, others=None, tolerance=1e-10, processes=None):
+    i, j, _ = _pairs(_run(vectors, others, ('parallel', tolerance), processes))
+    return i, j
+
+
+# pairs whose cosine is within tolerance of 0 (relative to their lengths,
+# unlike Vector.orthogonal, which looks at the plain inner product)
+def orthogonal_pairs(vectors, others=None, tolerance=1e-10, processes=None):
+    i, j, _ = _pairs(_run(vectors, others, ('range', -tolerance, tolerance, False), processes))
+    return i, j
+
+
+# The k most similar vectors of every vector (largest cosine first) among
+# `others`, or among the other `vectors`. Returns (indices, cosines), both
+# (N, k); missing neighbours (too few nonzero vectors) are -1 and -inf.
+def top_k_similar(vectors, k, others=None, processes=None):
+    parts = _run(vectors, others, ('topk', k), processes)
+    return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+
+if __name__ == '__main__':
+    # test code
+    vectors = [[1, 0, 0], [2, 0, 0], [0, 1, 0], [-1, 0, 0], [1, 1, 0], [0, 0, 0]]
+    print(parallel_pairs(vectors))
+    print(orthogonal_pairs(vectors))
+    print(pairs_within_angle(vectors, 45, in_degrees=True))
+    print(top_k_similar(vectors, 2))
+
+    # the zero vector gets no neighbours and is nobody's neighbour
+    indices, cosines = top_k_similar(vectors, 2)
+    if (indices[5] != -1).any() or (cosines[5] != -np.inf).any() or (indices == 5).any():
+        print('zero vector top-k test failed')
@@ -0,0 +1,285 @@
+import heapq
+
+import numpy as np
+
+from vector import Vector, FLOAT
+from linsys import LinearSystem
+import iterative
+
+
+# Linear system stored in CSR form: the coefficients of equation i are
+# values[indptr[i]:indptr[i+1]] in the columns indices[indptr[i]:indptr[i+1]].
+# Nothing here ever builds the dense n x n matrix.
+class SparseLinearSystem(object):
+
+    # elimination counts entries and constants below this fraction of the
+    # numbers combined into their row as zero (pivots, inconsistent rows)
+    NEAR_ZERO_EPS = 1e-10
+    # an updated entry this small next to its old value is rounding noise
+    # left by cancellation, and is dropped
+    CANCELLATION_EPS = 1e-14
+    # a pivot must be at least this fraction of the largest entry in its column
+    PIVOT_THRESHOLD = 0.1
+    # columns (fewest entries first) searched for the cheapest pivot
+    MARKOWITZ_COLUMNS = 4
+
+    ROWS_AND_CONSTANTS_MSG = 'There must be one constant term per equation'
+    COLUMN_OUT_OF_RANGE_MSG = 'Column index out of range for the system dimension'
+
+    def __init__(self, indptr, indices, values, constants, dimension):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.constants = np.asarray(constants, dtype=np.float64)
+        self.dimension = int(dimension)
+
+        if len(self.indptr) != len(self.constants) + 1:
+            raise ValueError(self.ROWS_AND_CONSTANTS_MSG)
+        if len(self.indices) and (self.indices.min() < 0 or self.indices.max() >= self.dimension):
+            raise ValueError(self.COLUMN_OUT_OF_RANGE_MSG)
+
+        # a column repeated within a row adds up, as in from_triplets and
+        # matvec, so the entries are summed once here
+        row_ids = np.repeat(np.arange(len(self.constants)), np.diff(self.indptr))
+        order = np.lexsort((self.indices, row_ids))
+        rows, cols = row_ids[order], self.indices[order]
+        repeated = (rows[1:] == rows[:-1]) & (cols[1:] == cols[:-1])
+        if repeated.any():
+            starts = np.flatnonzero(np.r_[True, ~repeated])
+            self.values = np.add.reduceat(self.values[order], starts)
+            self.indices = cols[starts]
+            self.indptr = np.r_[0, np.cumsum(np.bincount(rows[starts], minlength=len(self.constants)))]
+
+
+    # rows is a list of {column: coefficient} dicts (or (column, coefficient) pairs)
+    @classmethod
+    def from_rows(cls, rows, constants, dimension):
+        indptr = [0]
+        indices = []
+        values = []
+        for row in rows:
+            items = sorted(dict(row).items())
+            for col, x in items:
+                if x != 0:
+                    indices.append(col)
+                    values.append(x)
+            indptr.append(len(indices))
+        return cls(indptr, indices, values, constants, dimension)
+
+
+    @classmethod
+    def from_triplets(cls, rows, cols, vals, constants, dimension):
+        equations = [{} for _ in constants]
+        for i, j, x in zip(rows, cols, vals):
+            equations[i][j] = equations[i].get(j, 0) + x
+        return cls.from_rows(equations, constants, dimension)
+
+
+    @classmethod
+    def from_linear_system(cls, system):
+        rows = [{j: float(x) for j, x in enumerate(p.normal_vector) if x != 0} for p in system.planes]
+        constants = [float(p.constant_term) for p in system.planes]
+        return cls.from_rows(rows, constants, system.dimension)
+
+
+    def __len__(self):
+        return len(self.constants)
+
+
+    def nnz(self):
+        return len(self.values)
+
+
+    def row(self, i):
+        start, end = self.indptr[i], self.indptr[i+1]
+        return self.indices[start:end], self.values[start:end]
+
+
+    # A x for a float vector x, O(nnz)
+    def matvec(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        row_ids = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        return np.bincount(row_ids, weights=self.values * x[self.indices], minlength=len(self))
+
+
+    # same result as LinearSystem's version, but only stored entries are looked at
+    def indices_of_first_nonzero_terms_in_each_row(self):
+        indices = [-1] * len(self)
+        for i in range(len(self)):
+            cols, vals = self.row(i)
+            nonzero = cols[np.abs(vals) >= self.NEAR_ZERO_EPS]
+            if len(nonzero):
+                indices[i] = int(nonzero.min())
+        return indices
+
+
+    def __str__(self):
+        return 'Sparse Linear System: {} equations, {} variables, {} nonzeros'.format(
+            len(self), self.dimension, self.nnz())
+
+
+    # Gaussian elimination on dict rows. Pivots are picked on the fly by
+    # the Markowitz rule: among the entries of the MARKOWITZ_COLUMNS columns
+    # with the fewest entries that pass the threshold test, take the one
+    # with the smallest (row length - 1) * (column length - 1), the most
+    # fill-in it can cause. Returns the pivot (row, column) sequence with
+    # the reduced rows and constants, the rows left without a pivot and
+    # the magnitude their constants were computed from.
+    def _eliminate(self):
+        rows = []
+        for i in range(len(self)):
+            cols, vals = self.row(i)
+            rows.append({int(j): float(x) for j, x in zip(cols, vals) if x != 0})
+        constants = [float(c) for c in self.constants]
+        # bounds on the size of every row's coefficients and constant, so
+        # the zero tests are relative to what was combined into the row
+        scale = [max([abs(x) for x in r.values()], default=0.0) for r in rows]
+        constant_scale = [abs(c) for c in constants]
+
+        column_rows = [set() for _ in range(self.dimension)]
+        for i, r in enumerate(rows):
+            for j in r:
+                column_rows[j].add(i)
+
+        heap = [(len(rs), j) for j, rs in enumerate(column_rows) if rs]
+        heapq.heapify(heap)
+        active = [True] * len(rows)
+        pivots = []
+
+        while True:
+            choice = self._choose_pivot(heap, rows, column_rows, scale)
+            if choice is None:
+                break
+            pivot_row, col = choice
+            pivot = rows[pivot_row]
+            pivot_value = pivot[col]
+
+            active[pivot_row] = False
+            for j in pivot:
+                column_rows[j].discard(pivot_row)
+
+            others = [(j, x) for j, x in pivot.items() if j != col]
+            cancellation_eps = self.CANCELLATION_EPS
+            for i in column_rows[col]:
+                r = rows[i]
+                factor = r.pop(col) / pivot_value
+                for j, x in others:
+                    old = r.get(j)
+                    if old is None:
+                        r[j] = -factor * x
+                        column_rows[j].add(i)
+                        continue
+                    y = old - factor * x
+                    if abs(y) > cancellation_eps * abs(old):
+                        r[j] = y
+                    else:
+                        del r[j]
+                        column_rows[j].discard(i)
+                constants[i] -= factor * constants[pivot_row]
+                scale[i] = max(scale[i], abs(factor) * scale[pivot_row])
+                constant_scale[i] = max(constant_scale[i], abs(factor) * constant_scale[pivot_row])
+            column_rows[col] = set()
+
+            for j in pivot:
+                if j != col and column_rows[j]:
+                    heapq.heappush(heap, (len(column_rows[j]), j))
+            pivots.append((pivot_row, col))
+
+        leftover = [i for i in range(len(rows)) if active[i]]
+        return pivots, rows, constants, leftover, constant_scale
+
+
+    # next (row, column) to pivot on, None when no column has entries left.
+    # Columns whose entries are all rounding noise next to their rows are
+    # cleared on the way: they have no pivot.
+    def _choose_pivot(self, heap, rows, column_rows, scale):
+        searched = []
+        best = None
+        while heap and len(searched) < self.MARKOWITZ_COLUMNS:
+            count, col = heapq.heappop(heap)
+            candidates = column_rows[col]
+            if count != len(candidates) or not candidates:
+                continue  # stale heap entry
+
+            usable = [i for i in candidates if abs(rows[i][col]) > self.NEAR_ZERO_EPS * scale[i]]
+            if not usable:
+                for i in candidates:
+                    del rows[i][col]
+                column_rows[col] = set()
+                continue
+
+            searched.append((count, col))
+            largest = max(abs(rows[i][col]) for i in usable)
+            for i in usable:
+                size = abs(rows[i][col]) / largest
+                if size >= self.PIVOT_THRESHOLD:
+                    # ties go to the larger pivot
+                    key = ((len(rows[i]) - 1) * (count - 1), -size)
+                    if best is None or key < best[0]:
+                        best = (key, i, col)
+            if best[0][0] == 0:
+                break  # no fill-in at all, nothing can beat it
+
+        for count, col in searched:
+            if best is None or col != best[2]:
+                heapq.heappush(heap, (count, col))
+        return None if best is None else (best[1], best[2])
+
+
+    # same as LinearSystem.solve_iterative; only matvec and row slices of the
+    # CSR arrays are used, so the cost per iteration is O(nnz)
+    def solve_iterative(self, method='cg', **options):
+        return iterative.METHODS[method](self, **options)
+
+
+    # the unique solution as a float Vector, or a message when there is none / infinitely many
+    def compute_solution(self):
+        pivots, rows, constants, leftover, constant_scale = self._eliminate()
+
+        for i in leftover:
+            if abs(constants[i]) > self.NEAR_ZERO_EPS * constant_scale[i]:
+                return LinearSystem.NO_SOLUTIONS_MSG
+        if len(pivots) < self.dimension:
+            return LinearSystem.INF_SOLUTIONS_MSG
+
+        # every other column of a pivot row was pivoted later, so back
+        # substitution runs over the pivots in reverse order
+        x = np.zeros(self.dimension)
+        for row, col in reversed(pivots):
+            r = rows[row]
+            total = constants[row]
+            for j, value in r.items():
+                if j != col:
+                    total -= value * x[j]
+            x[col] = total / r[col]
+        return Vector(x, FLOAT)
+
+
+if __name__ == '__main__':
+    # test code
+    s = SparseLinearSystem.from_rows([{0: 1, 1: 2, 2: 3}, {0: 2, 1: -1, 2: 1}, {1: 1, 2: -1}],
+                                     [6, 2, 0], 3)
+    print(s)
+    print(s.compute_solution())
+    print(s.indices_of_first_nonzero_terms_in_each_row())
+
+    # 5-point Laplacian on a 40 x 40 grid: fill-in entries are small but must
+    # not be dropped, the residual has to stay at rounding level
+    m = 40
+    rows = []
+    for k in range(m * m):
+        row = {k: 4.0}
+        for neighbour, inside in ((k - m, k >= m), (k + m, k < m * (m - 1)),
+                                  (k - 1, k % m > 0), (k + 1, k % m < m - 1)):
+            if inside:
+                row[neighbour] = -1.0
+        rows.append(row)
+    grid = SparseLinearSystem.from_rows(rows, np.linspace(0, 1, m * m), m * m)
+    residual = np.abs(grid.matvec(grid.compute_solution().coordinates) - grid.constants).max()
+    if not residual < 1e-10:
+        print('2D grid test failed, residual {}'.format(residual))
+
+    # a column repeated within a row is summed, for elimination as for matvec
+    repeated = SparseLinearSystem([0, 2, 3], [0, 0, 1], [1, 1, 1], [2, 1], 2)
+    if repeated.compute_solution() != Vector([1, 1], FLOAT) or repeated.nnz() != 2:
+        print('repeated column test failed')
@@ -0,0 +1,303 @@
+import math
+import operator
+from decimal import Decimal
+
+import vector
+from vector import Vector, FLOAT
+
+try:
+    import numpy as np
+except ImportError:  # only the float backend needs it
+    np = None
+
+
+def _number(x, backend):
+    if backend == FLOAT:
+        return float(x)
+    return x if isinstance(x, Decimal) else Decimal(x)
+
+
+# A number computed from vector expressions: inner products, magnitudes and
+# the + - * / of those and of plain numbers. Nothing is computed until
+# evaluate(), and a node used twice is computed once per evaluation.
+class ScalarExpr(object):
+
+    __slots__ = ('op', 'args', 'backend')
+
+    def __init__(self, op, args, backend=None):
+        self.op = op
+        self.args = args
+        self.backend = backend
+
+    FOLDED = {'add': operator.add, 'sub': operator.sub, 'mul': operator.mul}
+
+    @staticmethod
+    def of(x):
+        return x if isinstance(x, ScalarExpr) else ScalarExpr('const', (x,))
+
+    def _integer(self):
+        return self.op == 'const' and isinstance(self.args[0], int)
+
+    # integer constants (the coefficients plus/minus chains add up) are
+    # folded right away, exactly in any backend, and a factor of 1 is dropped
+    def _combine(self, op, other, message=None):
+        other = ScalarExpr.of(other)
+        if op in self.FOLDED and self._integer() and other._integer():
+            return ScalarExpr('const', (self.FOLDED[op](self.args[0], other.args[0]),),
+                              self.backend or other.backend)
+        if op == 'mul' and other._integer() and other.args[0] == 1:
+            return self
+        if op == 'mul' and self._integer() and self.args[0] == 1:
+            return other
+        return ScalarExpr(op, (self, other, message), self.backend or other.backend)
+
+    def __add__(self, other):
+        return self._combine('add', other)
+
+    def __radd__(self, other):
+        return ScalarExpr.of(other)._combine('add', self)
+
+    def __sub__(self, other):
+        return self._combine('sub', other)
+
+    def __rsub__(self, other):
+        return ScalarExpr.of(other)._combine('sub', self)
+
+    def __mul__(self, other):
+        return self._combine('mul', other)
+
+    def __rmul__(self, other):
+        return ScalarExpr.of(other)._combine('mul', self)
+
+    def __truediv__(self, other):
+        return self._combine('div', other)
+
+    def __rtruediv__(self, other):
+        return ScalarExpr.of(other)._combine('div', self)
+
+    def __neg__(self):
+        return ScalarExpr.of(0)._combine('sub', self)
+
+    def sqrt(self):
+        return ScalarExpr('sqrt', (self,), self.backend)
+
+    def evaluate(self):
+        return self._value(self.backend or vector.default_backend, {})
+
+    # evaluated with an explicit stack rather than recursion: a coefficient
+    # built by a long loop of .plus() or .vector_perp() calls is a chain as
+    # deep as the loop
+    def _value(self, backend, memo):
+        stack = [self]
+        while stack:
+            node = stack[-1]
+            key = id(node)
+            if key in memo:
+                stack.pop()
+                continue
+            op, args = node.op, node.args
+            if op == 'const':
+                value = _number(args[0], backend)
+            elif op == 'dot':
+                # the coefficients of both sides first (a bare vector has
+                # none to compute), so the product below finds them all in
+                # memo and nothing nests
+                pending = [c for a in args if a._bare() is None
+                           for _, c in a.terms.values() if id(c) not in memo]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                value = _inner_product(args[0], args[1], memo)
+            elif op == 'sqrt':
+                x = memo.get(id(args[0]))
+                if x is None:
+                    stack.append(args[0])
+                    continue
+                value = math.sqrt(x) if backend == FLOAT else x.sqrt()
+            else:
+                x, y = memo.get(id(args[0])), memo.get(id(args[1]))
+                if x is None or y is None:
+                    stack.extend([a for a, value in ((args[0], x), (args[1], y)) if value is None])
+                    continue
+                if op == 'add':
+                    value = x + y
+                elif op == 'sub':
+                    value = x - y
+                elif op == 'mul':
+                    value = x * y
+                else:
+                    if y == 0:
+                        raise Exception(args[2] or 'division by zero')
+                    value = x / y
+            memo[key] = value
+            stack.pop()
+        return memo[id(self)]
+
+
+# A linear combination of Vectors whose coefficients are ScalarExprs, built
+# by chaining the usual Vector methods on v.lazy() (or VectorExpr(v)):
+#
+#     v.lazy().minus(v.lazy().vector_projections(b)).scalar(c).evaluate()
+#
+# Every step only rewrites the combination, so no intermediate Vector is
+# built and no coordinate is converted again. evaluate() computes the
+# coefficients (each inner product in one pass over its inputs), then the
+# result coordinates in one more pass. This pays off with Decimal
+# coordinates and with long float vectors; for short float vectors the
+# bookkeeping costs more than the numpy temporaries it saves.
+#
+# The arithmetic is regrouped, so Decimal results can differ from the eager
+# chain in the last digits. Degenerate steps (projecting on or normalizing
+# a zero vector) raise when evaluated instead of returning a message.
+class VectorExpr(object):
+
+    __slots__ = ('terms', 'dimension', 'backend')
+
+    DIMENSIONS_MUST_MATCH_MSG = 'Vectors in an expression must have the same dimension'
+    ZERO_BASE_MSG = 'base vector can not be zero vector'
+    ZERO_UNIT_MSG = 'can not normalize zero vector'
+
+    # coordinates (or a Vector in another backend) are converted here, once
+    def __init__(self, v, backend=None):
+        if not isinstance(v, Vector):
+            v = Vector(v, backend)
+        elif backend is not None:
+            v = v.to_backend(backend)
+        self.terms = {id(v): (v, ScalarExpr.of(1))}
+        self.dimension = v.dimension
+        self.backend = v.backend
+
+    @classmethod
+    def _from_terms(cls, terms, dimension, backend):
+        expr = object.__new__(cls)
+        expr.terms = terms
+        expr.dimension = dimension
+        expr.backend = backend
+        return expr
+
+    def _expr_of(self, v):
+        if isinstance(v, VectorExpr):
+            if v.backend != self.backend:
+                v = VectorExpr._from_terms(
+                    {id(w): (w, c) for w, c in
+                     ((w.to_backend(self.backend), c) for w, c in v.terms.values())},
+                    v.dimension, self.backend)
+        else:
+            v = VectorExpr(v, self.backend)
+        if v.dimension != self.dimension:
+            raise ValueError(self.DIMENSIONS_MUST_MATCH_MSG)
+        return v
+
+    # the single Vector this expression stands for unchanged, if any
+    def _bare(self):
+        if len(self.terms) == 1:
+            v, c = next(iter(self.terms.values()))
+            if c.op == 'const' and c.args[0] == 1:
+                return v
+        return None
+
+    def _combine(self, v, sign):
+        terms = dict(self.terms)
+        for key, (w, c) in self._expr_of(v).terms.items():
+            if sign < 0:
+                c = -c
+            terms[key] = (w, terms[key][1] + c) if key in terms else (w, c)
+        return VectorExpr._from_terms(terms, self.dimension, self.backend)
+
+    def plus(self, v):
+        return self._combine(v, 1)
+
+    def minus(self, v):
+        return self._combine(v, -1)
+
+    def scalar(self, c):
+        c = ScalarExpr.of(c)
+        terms = {key: (w, coefficient * c) for key, (w, coefficient) in self.terms.items()}
+        return VectorExpr._from_terms(terms, self.dimension, self.backend)
+
+    def inner_product(self, v):
+        return ScalarExpr('dot', (self, self._expr_of(v)), self.backend)
+
+    def magnitude(self):
+        return self.inner_product(self).sqrt()
+
+    def unit(self):
+        return self.scalar(ScalarExpr.of(1)._combine('div', self.magnitude(), self.ZERO_UNIT_MSG))
+
+    # b * (v . b) / (b . b), the same vector as Vector.vector_projections
+    # without normalizing b first
+    def vector_projections(self, baseVector):
+        base = self._expr_of(baseVector)
+        return base.scalar(self.inner_product(base)._combine('div', base.inner_product(base),
+                                                             self.ZERO_BASE_MSG))
+
+    def vector_perp(self, baseVector):
+        return self.minus(self.vector_projections(baseVector))
+
+    def evaluate(self):
+        bare = self._bare()
+        if bare is not None:
+            return bare
+        return Vector._wrap(_coordinates(self, {}), self.backend)
+
+
+# coordinates of an expression in one pass over its vectors: a new float64
+# array, or a tuple of Decimals
+def _coordinates(expr, memo):
+    terms = list(expr.terms.values())
+    coefficients = [c._value(expr.backend, memo) for _, c in terms]
+    if expr.backend == FLOAT:
+        out = terms[0][0].coordinates * coefficients[0]
+        if len(terms) > 1:
+            scratch = np.empty_like(out)
+            for (w, _), c in zip(terms[1:], coefficients[1:]):
+                np.multiply(w.coordinates, c, out=scratch)
+                out += scratch
+        return out
+    c = coefficients[0]
+    if len(terms) == 1:
+        return tuple([c * x for x in terms[0][0].coordinates])
+    # the common two-term case (a projection taken off a vector) in one
+    # comprehension; further terms are added a term at a time
+    d = coefficients[1]
+    out = [c * x + d * y for x, y in zip(terms[0][0].coordinates, terms[1][0].coordinates)]
+    for (w, _), c in zip(terms[2:], coefficients[2:]):
+        out = [o + c * x for o, x in zip(out, w.coordinates)]
+    return tuple(out)
+
+
+def _dot(x, y):
+    if isinstance(x, tuple):
+        return sum(map(operator.mul, x, y))
+    return float(np.dot(x, y))
+
+
+def _inner_product(a, b, memo):
+    x = a._bare()
+    x = x.coordinates if x is not None else _coordinates(a, memo)
+    if a is b:
+        return _dot(x, x)
+    y = b._bare()
+    return _dot(x, y.coordinates if y is not None else _coordinates(b, memo))
+
+
+if __name__ == '__main__':
+    # test code
+    v = Vector([3.039, 1.879])
+    b = Vector([0.825, 2.036])
+    print(v.lazy().vector_projections(b).evaluate(), v.vector_projections(b))
+    print(v.lazy().vector_perp(b).scalar(2).evaluate(), v.vector_perp(b).scalar(2))
+    print(v.lazy().plus(b).inner_product(b).evaluate(), v.plus(b).inner_product(b))
+    print(v.lazy().unit().evaluate(), v.unit())
+
+    # a long chain of steps on the same vector evaluates without recursing
+    chain = v.lazy()
+    for _ in range(1500):
+        chain = chain.plus(b)
+    if chain.evaluate() != v.plus(b.scalar(1500)):
+        print('long chain test failed')
+    perp = v.lazy()
+    for _ in range(1500):
+        perp = perp.vector_perp(b)
+    if perp.evaluate().minus(v.vector_perp(b)).magnitude() > 1e-20:
+        print('long perp chain test failed')
@@ -1,15 +1,60 @@
 import math
 from decimal import Decimal, getcontext
 
+try:
+    import numpy as np
+except ImportError:  # the float backend is optional
+    np = None
+
 getcontext().prec =30
 
+# numeric backends: exact-ish Decimal tuples (default) or contiguous float64 arrays
+DECIMAL = 'decimal'
+FLOAT = 'float'
+BACKENDS = (DECIMAL, FLOAT)
+
+default_backend = DECIMAL
+
+
+# select the backend used by Vector() when none is given
+def set_default_backend(backend):
+    global default_backend
+    if backend not in BACKENDS:
+        raise ValueError(Vector.UNKNOWN_BACKEND_MSG.format(backend))
+    if backend == FLOAT and np is None:
+        raise ImportError(Vector.NUMPY_REQUIRED_MSG)
+    default_backend = backend
+
+
+# Vectors are immutable: coordinates can not be reassigned (float arrays are
+# read-only), so magnitude, unit vector and hash are computed at most once.
 class Vector(object):
-    def __init__(self, coordinates):
+
+    __slots__ = ('coordinates', 'dimension', 'backend', '_magnitude', '_unit', '_hash')
+
+    UNKNOWN_BACKEND_MSG = 'Unknown backend {!r}, expected "decimal" or "float"'
+    NUMPY_REQUIRED_MSG = 'The float backend needs numpy installed'
+    IMMUTABLE_MSG = 'Vector objects are immutable'
+    DIMENSIONS_MUST_MATCH_MSG = 'Vectors must have the same dimension'
+
+    def __init__(self, coordinates, backend=None):
+        if backend is None:
+            backend = default_backend
+        if backend not in BACKENDS:
+            raise ValueError(self.UNKNOWN_BACKEND_MSG.format(backend))
+        if backend == FLOAT and np is None:
+            raise ImportError(self.NUMPY_REQUIRED_MSG)
+
         try:
-            if not coordinates:
+            if len(coordinates) == 0:
                 raise ValueError
-            self.coordinates = tuple([Decimal(x) for x in coordinates])
-            self.dimension = len(coordinates)
+            if backend == FLOAT:
+                # always a private copy, the caller's array stays writable
+                new_coordinates = np.array(coordinates, dtype=np.float64)
+                if new_coordinates.ndim != 1:
+                    raise TypeError
+            else:
+                new_coordinates = tuple([Decimal(x) for x in coordinates])
 
         except ValueError:
             raise ValueError('The coordinates must be nonempty')
@@ -17,50 +62,156 @@ class Vector(object):
         except TypeError:
             raise TypeError('The coordinates must be an iterable')
 
+        self._set_coordinates(new_coordinates, backend)
+
+    # build a Vector around coordinates an operation just produced (a fresh
+    # float64 array or a tuple of Decimals) without converting them again
+    @classmethod
+    def _wrap(cls, coordinates, backend):
+        v = object.__new__(cls)
+        v._set_coordinates(coordinates, backend)
+        return v
+
+    def _set_coordinates(self, coordinates, backend):
+        if backend == FLOAT:
+            coordinates.flags.writeable = False
+        object.__setattr__(self, 'coordinates', coordinates)
+        object.__setattr__(self, 'dimension', len(coordinates))
+        object.__setattr__(self, 'backend', backend)
+        object.__setattr__(self, '_magnitude', None)
+        object.__setattr__(self, '_unit', None)
+        object.__setattr__(self, '_hash', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(self.IMMUTABLE_MSG)
+
+    def __delattr__(self, name):
+        raise AttributeError(self.IMMUTABLE_MSG)
+
+    # pickle/copy through the constructor, since attributes can not be set
+    def __reduce__(self):
+        return (Vector, (self.coordinates, self.backend))
+
+    # let a Vector be used wherever a list of coordinates is expected
+    def __iter__(self):
+        return iter(self.coordinates)
+
+    def __getitem__(self, i):
+        return self.coordinates[i]
+
+    def __len__(self):
+        return self.dimension
+
     # for printing 
     def __str__(self):
+        if self.backend == FLOAT:
+            return 'Vector: {}'.format(tuple(self.coordinates.tolist()))
         return 'Vector: {}'.format(self.coordinates)
 
-    # check if 2 vectors are same
+    # check if 2 vectors are same. Across backends both sides are compared
+    # as exact Decimals (every float is one), so == is symmetric.
     def __eq__(self, v):
-        return self.coordinates == v.coordinates
+        if not isinstance(v, Vector):
+            return NotImplemented
+        if self.backend == FLOAT and v.backend == FLOAT:
+            return bool(np.array_equal(self.coordinates, v.coordinates))
+        return self._exact_coordinates() == v._exact_coordinates()
+
+    # equal vectors hash alike across backends: hash(Decimal(x)) == hash(x)
+    # for every float x, so the float tuple hashes like its exact Decimals
+    def __hash__(self):
+        if self._hash is None:
+            if self.backend == FLOAT:
+                h = hash(tuple(self.coordinates.tolist()))
+            else:
+                h = hash(self.coordinates)
+            object.__setattr__(self, '_hash', h)
+        return self._hash
+
+    def _exact_coordinates(self):
+        if self.backend == FLOAT:
+            return tuple([Decimal(x) for x in self.coordinates.tolist()])
+        return self.coordinates
+
+    # coordinates of v expressed in this vector's backend, for arithmetic
+    # with v (which must have the same dimension)
+    def _coordinates_of(self, v):
+        if v.dimension != self.dimension:
+            raise ValueError(self.DIMENSIONS_MUST_MATCH_MSG)
+        if v.backend == self.backend:
+            return v.coordinates
+        if self.backend == FLOAT:
+            return np.asarray(v.coordinates, dtype=np.float64)
+        return tuple([Decimal(x) for x in v.coordinates])
+
+    # same vector in another backend
+    def to_backend(self, backend):
+        if backend == self.backend:
+            return self
+        return Vector(self.coordinates, backend)
     
     # method for vectors plus together
     def plus(self, v):
-        new_coordinates = [x + y for x,y in zip(self.coordinates, v.coordinates)]
-        return Vector(new_coordinates)
+        if self.backend == FLOAT:
+            return Vector._wrap(self.coordinates + self._coordinates_of(v), FLOAT)
+        new_coordinates = tuple([x + y for x,y in zip(self.coordinates, self._coordinates_of(v))])
+        return Vector._wrap(new_coordinates, self.backend)
     
     # method for vectors minus
     def minus(self, v):
-        new_coordinates = [x-y for x,y in zip(self.coordinates, v.coordinates)]
-        return Vector(new_coordinates)
+        if self.backend == FLOAT:
+            return Vector._wrap(self.coordinates - self._coordinates_of(v), FLOAT)
+        new_coordinates = tuple([x-y for x,y in zip(self.coordinates, self._coordinates_of(v))])
+        return Vector._wrap(new_coordinates, self.backend)
     
     # method for vector scale
     def scalar(self, c):
-        new_coordinates = [c*x for x in self.coordinates]
-        return Vector(new_coordinates)
+        if self.backend == FLOAT:
+            return Vector._wrap(self.coordinates * float(c), FLOAT)
+        new_coordinates = tuple([Decimal(c*x) for x in self.coordinates])
+        return Vector._wrap(new_coordinates, self.backend)
     
-    # calculate vector's magnitude
+    # record a chain of plus/minus/scalar/inner_product/projection steps and
+    # compute it in one pass on evaluate() (see vecexpr.VectorExpr)
+    def lazy(self):
+        from vecexpr import VectorExpr
+        return VectorExpr(self)
+
+    # calculate vector's magnitude (once, the vector can not change)
     def magnitude(self):
-        magnitude = 0
-        for i in range (0, self.dimension):
-            magnitude += self.coordinates[i]**2
-        magnitude = magnitude ** (Decimal(0.5))
+        if self._magnitude is not None:
+            return self._magnitude
+        if self.backend == FLOAT:
+            magnitude = math.sqrt(float(np.dot(self.coordinates, self.coordinates)))
+        else:
+            magnitude = 0
+            for i in range (0, self.dimension):
+                magnitude += self.coordinates[i]**2
+            magnitude = magnitude ** (Decimal(0.5))
+        object.__setattr__(self, '_magnitude', magnitude)
         return magnitude
     
     # calcuate vector's unit vector (or its direction) (or normalize)
     def unit(self):
+        if self._unit is not None:
+            return self._unit
         if self.magnitude()==0:
             return "can not normalize zero vector"
-        unit_vector = self.scalar(Decimal(1.0)/self.magnitude())
+        if self.backend == FLOAT:
+            unit_vector = self.scalar(1.0/self.magnitude())
+        else:
+            unit_vector = self.scalar(Decimal(1.0)/self.magnitude())
         #   unit_coordinates = [(1/self.magnitude())*x for x in self.coordinates]
         #return  Vector(unit_coordinates)
+        object.__setattr__(self, '_unit', unit_vector)
         return unit_vector
     
     # Inner produc or Dot prodcuts
     def inner_product(self, v):
+        if self.backend == FLOAT:
+            return float(np.dot(self.coordinates, self._coordinates_of(v)))
         product =0
-        inner_products = [x*y for x,y in zip(self.coordinates, v.coordinates)]
+        inner_products = [x*y for x,y in zip(self.coordinates, self._coordinates_of(v))]
         for i in range(0, len(inner_products)):
             product += inner_products[i]
         return product
@@ -70,7 +221,11 @@ class Vector(object):
         if self.magnitude() == 0 or v.magnitude() ==0:
             return "can not compute an angel with zero vector"
         
-        rad = math.acos(self.inner_product(v)/ (self.magnitude()*v.magnitude()))
+        cosine = self.inner_product(v)/ (self.magnitude()*v.magnitude())
+        if self.backend == FLOAT:
+            # float rounding can push the cosine just outside [-1, 1]
+            cosine = min(1.0, max(-1.0, cosine))
+        rad = math.acos(cosine)
         
         if in_degrees== False:
             return rad
@@ -81,10 +236,13 @@ class Vector(object):
     def is_zero(self, tolerance=1e-10):
         return self.magnitude() < tolerance
     
-    # check if 2 vectors are Parallel
-    def is_parallel_to(self, v):
-        return(self.is_zero() or v.is_zero() or self.angel(v, True) ==0 or
-               self.angel(v, True) == 180)
+    # check if 2 vectors are Parallel: the part of self perpendicular to v is
+    # shorter than `tolerance` times self (the sine of the angle). Comparing
+    # acos results with 0 or 180 fails for float rounding.
+    def is_parallel_to(self, v, tolerance=1e-10):
+        if self.is_zero() or v.is_zero():
+            return True
+        return self.vector_perp(v).magnitude() / self.magnitude() < tolerance
     
     
     # check if 2 vectors are Orthogonal  (dot products == 0)
@@ -118,12 +276,14 @@ class Vector(object):
     # calculate cross products vector (only for vectors in 3 dimensions; 
     #                                  or 2 dimenison w/ one dimension in zero)
     def cross_product(self, v):
+        if self.backend == FLOAT:
+            return Vector._wrap(np.cross(self.coordinates, self._coordinates_of(v)), FLOAT)
         x_1, y_1, z_1 = self.coordinates
-        x_2, y_2, z_2 = v.coordinates
+        x_2, y_2, z_2 = self._coordinates_of(v)
         new_coordinates= [y_1*z_2 - y_2*z_1,  
                           -(x_1*z_2 - x_2*z_1), 
                           x_1*y_2 - x_2*y_1]        
-        return Vector(new_coordinates)
+        return Vector(new_coordinates, self.backend)
     
     
     # calculate area of cross prdouct
@@ -133,19 +293,33 @@ class Vector(object):
     
     # calculate area of triangle of cross product
     def area_of_triangle_with(self, v):
+        if self.backend == FLOAT:
+            return self.area_of_parallelogram_with(v) / 2.0
         return self.area_of_parallelogram_with(v) / Decimal(2.0)
                  
 
-# test code
-vectorV1 = Vector([8.462, 7.893, -8.187])
-vectorW1 = Vector([6.984, -5.975, 4.778])
-vectorV2 = Vector([-8.987, -9.838, 5.031])
-vectorW2 = Vector([-4.268, -1.861, -8.866])
-vectorV3 = Vector([1.5, 9.547, 3.691])
-vectorW3 = Vector([-6.007, 0.124, 5.772])
-
-print(vectorV1.cross_product(vectorW1))
-#print(vectorV2.area_of_parallelogram(vectorW2))
-#print(vectorV3.area_of_triangle_with(vectorW3))
+if __name__ == '__main__':
+    # test code
+    vectorV1 = Vector([8.462, 7.893, -8.187])
+    vectorW1 = Vector([6.984, -5.975, 4.778])
+    vectorV2 = Vector([-8.987, -9.838, 5.031])
+    vectorW2 = Vector([-4.268, -1.861, -8.866])
+    vectorV3 = Vector([1.5, 9.547, 3.691])
+    vectorW3 = Vector([-6.007, 0.124, 5.772])
 
+    print(vectorV1.cross_product(vectorW1))
+    #print(vectorV2.area_of_parallelogram(vectorW2))
+    #print(vectorV3.area_of_triangle_with(vectorW3))
 
+    # equality across backends compares exact values, both ways, and equal
+    # vectors hash alike
+    if Vector(['0.1']) == Vector([0.1], FLOAT) or Vector([0.1], FLOAT) == Vector(['0.1']):
+        print('cross-backend equality test failed')
+    if not (Vector([0.5, 1]) == Vector([0.5, 1], FLOAT) and
+            hash(Vector([0.5, 1])) == hash(Vector([0.5, 1], FLOAT))):
+        print('cross-backend hash test failed')
+    try:
+        Vector([1, 2], FLOAT).plus(Vector([1, 2, 3], FLOAT))
+        print('dimension mismatch test failed')
+    except ValueError:
+        pass
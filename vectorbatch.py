@@ -0,0 +1,155 @@
+import numpy as np
+
+from vector import Vector, FLOAT
+
+
+# N vectors of the same dimension stored as one (N, d) float64 buffer.
+# The methods mirror Vector but run over every row at once; arguments can be
+# another batch of the same length (row by row), a single Vector or a 1-d
+# sequence (broadcast against every row).
+class VectorBatch(object):
+
+    DIMENSIONS_MUST_MATCH_MSG = 'All vectors in a batch must have the same dimension'
+    ONLY_3D_CROSS_PRODUCT_MSG = 'Cross products are only defined for 3-dimensional vectors'
+
+    def __init__(self, data, copy=False):
+        try:
+            if copy:
+                data = np.array(data, dtype=np.float64, order='C')
+            else:
+                data = np.ascontiguousarray(data, dtype=np.float64)
+        except ValueError:
+            raise ValueError(self.DIMENSIONS_MUST_MATCH_MSG)
+        if data.ndim != 2:
+            raise ValueError(self.DIMENSIONS_MUST_MATCH_MSG)
+        self.data = data
+        self.dimension = data.shape[1]
+
+    # build a batch from an iterable of Vector objects
+    @classmethod
+    def from_vectors(cls, vectors):
+        rows = [np.asarray(v.coordinates, dtype=np.float64) for v in vectors]
+        if not rows:
+            raise ValueError('The batch must be nonempty')
+        return cls(np.stack(rows))
+
+    # turn the batch back into float backend Vector objects
+    def to_vectors(self):
+        return [Vector(row, FLOAT) for row in self.data]
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    # an int gives a single Vector, a slice or index array gives a batch
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            return Vector(self.data[i], FLOAT)
+        return VectorBatch(self.data[i])
+
+    def __str__(self):
+        return 'VectorBatch: {} vectors in {} dimensions'.format(len(self), self.dimension)
+
+    def __eq__(self, other):
+        return bool(np.array_equal(self.data, self._operand(other)))
+
+    # raw array for another batch, a single Vector or an array like
+    def _operand(self, other):
+        if isinstance(other, VectorBatch):
+            return other.data
+        if isinstance(other, Vector):
+            return np.asarray(other.coordinates, dtype=np.float64)
+        return np.asarray(other, dtype=np.float64)
+
+    # a per-row value (one number for every vector) as a column
+    def _column(self, c):
+        c = np.asarray(c, dtype=np.float64)
+        if c.ndim == 1:
+            return c[:, None]
+        return c
+
+    def plus(self, other):
+        return VectorBatch(self.data + self._operand(other))
+
+    def minus(self, other):
+        return VectorBatch(self.data - self._operand(other))
+
+    # c is a single number or one number per vector
+    def scalar(self, c):
+        return VectorBatch(self.data * self._column(c))
+
+    def inner_product(self, other):
+        other = self._operand(other)
+        if other.ndim == 1:
+            return self.data @ other
+        return np.einsum('ij,ij->i', self.data, other)
+
+    def magnitude(self):
+        return np.sqrt(np.einsum('ij,ij->i', self.data, self.data))
+
+    # zero vectors can not be normalized, their rows stay zero
+    def unit(self):
+        magnitude = self.magnitude()
+        scale = np.divide(1.0, magnitude, out=np.zeros_like(magnitude), where=magnitude != 0)
+        return self.scalar(scale)
+
+    # angle of each pair in radians (or degrees), nan where a vector is zero
+    def angel(self, other, in_degrees=False):
+        other = self._operand(other)
+        other_magnitude = np.sqrt(np.einsum('...j,...j->...', other, other))
+        denominator = self.magnitude() * other_magnitude
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cosine = self.inner_product(other) / denominator
+        cosine = np.where(denominator == 0, np.nan, np.clip(cosine, -1.0, 1.0))
+        rad = np.arccos(cosine)
+        if in_degrees:
+            return np.degrees(rad)
+        return rad
+
+    def is_zero(self, tolerance=1e-10):
+        return self.magnitude() < tolerance
+
+    def orthogonal(self, other, tolerance=1e-10):
+        return np.abs(self.inner_product(other)) < tolerance
+
+    def cross_product(self, other):
+        other = self._operand(other)
+        if self.dimension != 3 or other.shape[-1] != 3:
+            raise ValueError(self.ONLY_3D_CROSS_PRODUCT_MSG)
+        return VectorBatch(np.cross(self.data, other))
+
+    # projection of every vector onto its base vector (zero bases give zero rows)
+    def vector_projections(self, base):
+        base = self._operand(base)
+        base_norm = np.einsum('...j,...j->...', base, base)
+        factor = np.divide(self.inner_product(base), base_norm,
+                           out=np.zeros(len(self)), where=base_norm != 0)
+        return VectorBatch(factor[:, None] * base)
+
+    def vector_perp(self, base):
+        return self.minus(self.vector_projections(base))
+
+    def area_of_parallelogram_with(self, other):
+        return self.cross_product(other).magnitude()
+
+    def area_of_triangle_with(self, other):
+        return self.area_of_parallelogram_with(other) / 2.0
+
+
+# (N, d) float64 rows of a VectorBatch, a list of Vectors or an array like,
+# without copying a batch's buffer
+def as_rows(vectors):
+    if isinstance(vectors, VectorBatch):
+        return vectors.data
+    if len(vectors) and isinstance(vectors[0], Vector):
+        return VectorBatch.from_vectors(vectors).data
+    return np.asarray(vectors, dtype=np.float64)
+
+
+if __name__ == '__main__':
+    # test code
+    batch = VectorBatch([[8.462, 7.893, -8.187], [-8.987, -9.838, 5.031], [1.5, 9.547, 3.691]])
+    others = VectorBatch([[6.984, -5.975, 4.778], [-4.268, -1.861, -8.866], [-6.007, 0.124, 5.772]])
+    print(batch.cross_product(others)[0])
+    print(batch.area_of_parallelogram_with(others))
+    print(batch.area_of_triangle_with(others))
+    print(batch.angel(others, in_degrees=True))